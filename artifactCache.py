@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# coding=utf-8
+import hashlib
+import json
+import os
+import pickle
+import zlib
+from functools import lru_cache
+from importlib.util import find_spec
+from pathlib import Path
+from typing import NamedTuple
+
+from loguru import logger
+
+import profiler
+from data import OccurrenceTable, Term, buildOccurrenceTable
+
+ARTIFACT_FORMAT = 1  # bumped when the layout of the artifact changes
+ARTIFACT_LIMIT = 32  # artifacts kept in the cache directory, the least recently written ones are removed
+IGNORED_CONFIG_KEYS = ("logLevel", "configPath", "schedulePath")  # they do not change the generated calendars
+SOURCE_MODULES = ("data", "indexParser", "numpyEngine", "utils")  # the code the compiled terms and calendars come from
+
+
+class CompiledTerm(NamedTuple):
+    """
+    A term ready to be serialized, its indexes are decoded and its occurrences are expanded
+    """
+
+    term: Term  # with the decoded indexes and the school-day calendar cached
+    table: OccurrenceTable
+    digest: str | None  # sha256 of the ICS file generated from it, None if it is not generated yet
+
+    def isGenerated(self, path: Path) -> bool:
+        """
+        Args:
+            path(Path): the output path of the ICS file
+
+        Returns:
+            bool: True if the file at path is the one generated from this term, so it can be kept as is
+        """
+        return self.digest is not None and getFileDigest(path) == self.digest
+
+
+def getFileDigest(path: Path) -> str | None:
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+@lru_cache(maxsize=1)
+def getSourceDigest() -> str:
+    """
+    Hash of the source of SOURCE_MODULES, a change of the parsing, expansion or serialization
+    invalidates every artifact even if the version of the program is not bumped
+
+    Returns:
+        str: the sha256 of the sources, the modules are located without being imported
+    """
+    digest = hashlib.sha256()
+    for module in SOURCE_MODULES:
+        spec = find_spec(module)
+        origin: str | None = spec.origin if spec is not None else None
+        digest.update(f"{module}\x00".encode())
+        if origin is not None and os.path.isfile(origin):
+            digest.update(Path(origin).read_bytes())
+    return digest.hexdigest()
+
+
+def compileTerm(term: Term, config: dict) -> CompiledTerm:
+    """
+    Decode the indexes, build the school-day calendar and expand the occurrences of a term
+
+    Args:
+        term(Term): the parsed term
+        config(dict): the user config
+
+    Returns:
+        CompiledTerm: the compiled term, not generated yet
+    """
+    with profiler.span("compile"):
+        term.getSchoolDays(config.get("countDayInHoliday") == True)
+        for course in term.courses:
+            course.getBlocksByDay(term)
+        return CompiledTerm(term, buildOccurrenceTable(term, config), None)
+
+
+class ArtifactCache:
+    """
+    On-disk cache of compiled terms, keyed by the content hash of schedule + config + program version + source code
+
+    An artifact is the pickled list of CompiledTerm compressed with zlib, it is written atomically.
+    Only artifacts written by this program should be put in the directory, since loading a pickle can run code.
+
+    Args:
+        directory(Path): the cache directory, created if it does not exist
+        version(str): the version of the program, artifacts of other versions are never loaded
+    """
+
+    def __init__(self, directory: Path, version: str) -> None:
+        self.directory = directory
+        self.version = version
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def getKey(self, schedule: bytes, config: dict) -> str:
+        """
+        Args:
+            schedule(bytes): the content of the schedule file
+            config(dict): the config of the generation
+
+        Returns:
+            str: the hash identifying the artifact
+        """
+        effectiveConfig: dict = {key: value for key, value in config.items() if key not in IGNORED_CONFIG_KEYS}
+        return hashlib.sha256(
+            b"\x00".join(
+                (
+                    f"{ARTIFACT_FORMAT}:{self.version}:{getSourceDigest()}".encode(),
+                    schedule,
+                    json.dumps(effectiveConfig, sort_keys=True, default=str).encode(),
+                )
+            )
+        ).hexdigest()
+
+    def getPath(self, key: str) -> Path:
+        return self.directory / f"{key}.artifact"
+
+    def load(self, key: str) -> list[CompiledTerm] | None:
+        """
+        Load the compiled terms of an artifact
+
+        Args:
+            key(str): the key from getKey()
+
+        Returns:
+            list[CompiledTerm] | None: the compiled terms, None if the artifact does not exist or is unreadable
+        """
+        path: Path = self.getPath(key)
+        try:
+            with profiler.span("loadArtifact"):
+                artifact: dict = pickle.loads(zlib.decompress(path.read_bytes()))
+        except FileNotFoundError:
+            return None
+        except Exception as e:  # a truncated or outdated pickle can raise almost anything
+            logger.warning(f"Compiled artifact {path.name} is corrupted and ignored: {e}")
+            return None
+        if artifact.get("format") != ARTIFACT_FORMAT or artifact.get("version") != self.version:
+            return None
+        logger.debug(f"Compiled artifact {path.name} is loaded")
+        return artifact["terms"]
+
+    def save(self, key: str, terms: list[CompiledTerm]) -> None:
+        """
+        Save the compiled terms, the file is replaced atomically and old artifacts are removed
+
+        Args:
+            key(str): the key from getKey()
+            terms(list[CompiledTerm]): the compiled terms
+        """
+        path: Path = self.getPath(key)
+        temporaryPath: Path = path.with_suffix(f".{os.getpid()}.tmp")
+        content: bytes = pickle.dumps(
+            {"format": ARTIFACT_FORMAT, "version": self.version, "terms": terms}, protocol=pickle.HIGHEST_PROTOCOL
+        )
+        temporaryPath.write_bytes(zlib.compress(content))
+        os.replace(temporaryPath, path)
+        logger.debug(f"Compiled artifact is saved to {path.name}, {len(content)} bytes before compression")
+
+        artifacts: list[Path] = sorted(
+            self.directory.glob("*.artifact"), key=lambda item: item.stat().st_mtime, reverse=True
+        )
+        for item in artifacts[ARTIFACT_LIMIT:]:
+            item.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    logger.warning("This module cannot run independently")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# coding=utf-8
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+
+from loguru import logger
+
+from powerschool import PowerSchool
+from requestHandler import RateLimiter, RequestHandler
+from utils import getChildPath
+
+T = TypeVar("T")
+
+
+class AsyncPowerSchoolClient:
+    """
+    Asyncio client of PowerSchool, many sessions are driven by one event loop
+
+    The blocking requests and the HTML parsing run in a thread pool,
+    so the network latency of the sessions overlaps and the event loop is never blocked.
+    After the login, the pages of a session are fetched concurrently.
+
+    Args:
+        baseUrl(str): the PowerSchool server, e.g. a local stand-in server for testing
+        concurrency(int): the maximum number of sessions in flight, it is also the size of the thread pool
+        htmlParser(str): the parser used by BeautifulSoup
+        backend(str): the parsing backend of PowerSchool, "xpath" or "bs4"
+        timeout(int): the timeout of every request in seconds
+        retry(int): the number of attempts of every request
+        rateLimiter(RateLimiter | None): the per-host rate limit shared by all sessions
+    """
+
+    def __init__(
+        self,
+        baseUrl: str = PowerSchool.BASE_URL,
+        concurrency: int = 8,
+        htmlParser: str = "lxml",
+        backend: str = "xpath",
+        timeout: int = 10,
+        retry: int = 3,
+        rateLimiter: RateLimiter | None = None,
+    ) -> None:
+        self.baseUrl = baseUrl.rstrip("/")
+        self.htmlParser = htmlParser
+        self.backend = backend
+        self.timeout = timeout
+        self.retry = retry
+        self.rateLimiter = rateLimiter
+        self.__semaphore = asyncio.Semaphore(concurrency)
+        # every session blocks a worker for a request and another one for parsing
+        self.__executor = ThreadPoolExecutor(max_workers=concurrency * 2, thread_name_prefix="powerschool")
+
+    async def __aenter__(self) -> "AsyncPowerSchoolClient":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+
+    async def __run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self.__executor, partial(func, *args, **kwargs))
+
+    async def fetchPages(self, username: str, password: str, paths: list[str] | None = None) -> list[bytes]:
+        """
+        Login and fetch the pages of a session
+
+        Args:
+            username(str): the username of PowerSchool
+            password(str): the password of PowerSchool
+            paths(list[str] | None): the pages to fetch after the login, defaults to the schedule page
+
+        Returns:
+            list[bytes]: the home page returned by the login, followed by the content of every fetched page
+        """
+        paths = paths if paths is not None else [PowerSchool.SCHEDULE_PATH]
+        requester = RequestHandler(
+            timeout=self.timeout, retry=self.retry, headers=PowerSchool.HEADERS, rateLimiter=self.rateLimiter
+        )
+        logger.debug(f"Connecting to {self.baseUrl} as {username}...")
+        homePage = await self.__run(
+            requester.post, self.baseUrl + PowerSchool.LOGIN_PATH, data=PowerSchool.getLoginData(username, password)
+        )
+        # the session cookie is set by the login, the remaining pages are independent of each other
+        pages = await asyncio.gather(*(self.__run(requester.get, self.baseUrl + path) for path in paths))
+        return [homePage.content] + [page.content for page in pages]
+
+    async def login(self, username: str, password: str) -> PowerSchool:
+        """
+        Login to PowerSchool
+
+        Args:
+            username(str): the username of PowerSchool
+            password(str): the password of PowerSchool
+
+        Returns:
+            PowerSchool: the logged in instance, the same as PowerSchool(username, password)
+        """
+        async with self.__semaphore:
+            homePage, schedulePage = await self.fetchPages(username, password)
+            powerschool: PowerSchool = await self.__run(
+                PowerSchool.fromPages, homePage, schedulePage, htmlParser=self.htmlParser, backend=self.backend
+            )
+        powerschool.mode = "request"
+        powerschool.username, powerschool.password = username, password
+        logger.success(f"Successfully login to PowerSchool as {username}")
+        return powerschool
+
+    async def loginMany(self, accounts: list[tuple[str, str]]) -> list[PowerSchool | Exception]:
+        """
+        Login to PowerSchool with many accounts concurrently
+
+        Args:
+            accounts(list[tuple[str, str]]): the usernames and passwords
+
+        Returns:
+            list[PowerSchool | Exception]: the instance of every account, or the exception raised by its login
+        """
+        return await asyncio.gather(
+            *(self.login(username, password) for username, password in accounts), return_exceptions=True
+        )
+
+
+def loginMany(accounts: list[tuple[str, str]], **kwargs) -> list[PowerSchool | Exception]:
+    """
+    Synchronous entry of AsyncPowerSchoolClient.loginMany()
+
+    Args:
+        accounts(list[tuple[str, str]]): the usernames and passwords
+        **kwargs: the arguments of AsyncPowerSchoolClient
+
+    Returns:
+        list[PowerSchool | Exception]: the instance of every account, or the exception raised by its login
+    """
+
+    async def run() -> list[PowerSchool | Exception]:
+        async with AsyncPowerSchoolClient(**kwargs) as client:
+            return await client.loginMany(accounts)
+
+    return asyncio.run(run())
+
+
+def harvestSchedules(
+    accounts: list[dict], defaults: dict, outputPath: Path, jobs: int = 4, rate: float = 2, **kwargs
+) -> list[dict]:
+    """
+    Build the schedule.json of many accounts without asking the user, a failed account does not abort the others
+
+    Args:
+        accounts(list[dict]): {"username", "password", "term"(optional)} of every account,
+            "term" overrides the term parameters of defaults
+        defaults(dict): the term parameters, {"name", "start", "end", "duration", "cycle"}
+        outputPath(Path): the directory of the schedules, one "<username>.json" per account
+        jobs(int): the maximum number of sessions in flight
+        rate(float): the maximum number of requests per second to PowerSchool
+        **kwargs: the other arguments of AsyncPowerSchoolClient
+
+    Returns:
+        list[dict]: the status of every account, {"username", "status", "path" or "error"}
+    """
+    outputPath.mkdir(parents=True, exist_ok=True)
+    # a malformed entry is reported as failed instead of aborting the accounts before any login
+    paths: list[Path | Exception] = []
+    for account in accounts:
+        try:
+            if not isinstance(account, dict):
+                raise TypeError(f"an account must be an object, not {type(account).__name__}")
+            for key in ("username", "password"):
+                if not isinstance(account.get(key), str) or not account[key]:
+                    raise ValueError(f'"{key}" must be a non-empty string')
+            paths.append(getChildPath(outputPath, f"{account['username']}.json"))
+        except (TypeError, ValueError) as e:
+            paths.append(e)
+    validAccounts: list[dict] = [account for account, path in zip(accounts, paths) if isinstance(path, Path)]
+    loggedIn = iter(
+        loginMany(
+            [(account["username"], account["password"]) for account in validAccounts],
+            concurrency=jobs,
+            rateLimiter=RateLimiter(rate),
+            **kwargs,
+        )
+    )
+
+    report: list[dict] = []
+    for i, (account, path) in enumerate(zip(accounts, paths)):
+        name: Any = account.get("username") if isinstance(account, dict) else None
+        username: str = name if isinstance(name, str) and name else f"<account {i + 1}>"
+        try:
+            if isinstance(path, Exception):
+                raise path
+            result: PowerSchool | Exception = next(loggedIn)
+            if isinstance(result, Exception):
+                raise result
+            term: dict = defaults | account.get("term", {})
+            scheduleJson: dict = result.buildScheduleJson(
+                term.get("name", "Term"), term["start"], term["end"], term.get("duration", 70), term.get("cycle", 2)
+            )
+            path.write_text(json.dumps(scheduleJson, ensure_ascii=False, indent=4), encoding="utf-8")
+        except Exception as e:
+            logger.error(f"[{username}] Failed: {type(e).__name__}: {e}")
+            report.append({"username": username, "status": "failed", "error": f"{type(e).__name__}: {e}"})
+        else:
+            logger.success(f"[{username}] Schedule is written to {path}")
+            report.append({"username": username, "status": "ok", "path": str(path)})
+
+    succeeded: int = sum(item["status"] == "ok" for item in report)
+    logger.info(f"{succeeded} of {len(report)} accounts succeeded")
+    return report
+
+
+if __name__ == "__main__":
+    logger.warning("This module cannot run independently")
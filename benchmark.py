@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# coding=utf-8
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Callable
+
+from loguru import logger
+
+IMPORT_TIME_BUDGET = 0.25  # seconds, the cold-start budget of "import data"
+BLOCK_TIMES: list[list[int]] = [[8, 0], [9, 15], [10, 30], [13, 0], [14, 15], [15, 30], [16, 45], [18, 0]]
+
+
+def generateSchedule(
+    days: int = 180,
+    courses: int = 12,
+    holidays: int = 20,
+    cycle: int = 2,
+    compensations: int = 2,
+    blocks: int = 5,
+    start: datetime = datetime(2024, 9, 2),
+    seed: int = 0,
+) -> dict[str, dict]:
+    """
+    Generate a synthetic schedule.json
+
+    Args:
+        days(int): the length of the term in calendar days
+        courses(int): the number of courses
+        holidays(int): the number of holidays, each of them lasts 1 to 3 days
+        cycle(int): the number of weeks per cycle
+        compensations(int): the number of compensation days, on the weekends of the term
+        blocks(int): the number of blocks per day
+        start(datetime): the first day of the term
+        seed(int): the random seed, the same arguments always generate the same schedule
+
+    Returns:
+        dict[str, dict]: the schedule
+    """
+    rng = random.Random(seed)
+    cycleDay: int = cycle * 5
+    end: datetime = start + timedelta(days=days - 1)
+    toList: Callable[[datetime], list[int]] = lambda date: [date.year, date.month, date.day]
+
+    courseData: dict[str, dict] = {}
+    for i in range(courses):
+        block: int = rng.randint(1, blocks)
+        style: int = i % 4
+        if style == 0:  # traditional abbreviation
+            index: list = [[rng.choice(["odd", "even", "everyday"]), block]]
+        elif style == 1:  # traditional day list
+            index = [[sorted(rng.sample(range(1, cycleDay + 1), k=min(3, cycleDay))), block]]
+        elif style == 2:  # Powerschool range
+            first: int = rng.randint(1, cycleDay)
+            index = [f"P{block}({first}-{rng.randint(first, cycleDay)})"]
+        else:  # Powerschool list
+            index = [f"P{block}({','.join(str(day) for day in sorted(rng.sample(range(1, cycleDay + 1), k=2)))})"]
+        courseData[f"Course {i + 1}"] = {"teacher": f"Teacher {i + 1}", "index": index, "location": f"R{100 + i}"}
+
+    weekends: list[datetime] = [start + timedelta(days=n) for n in range(days) if (start + timedelta(days=n)).weekday() >= 5]
+    holidayData: dict[str, dict] = {}
+    for i in range(holidays):
+        first = start + timedelta(days=rng.randrange(days))
+        holidayData[f"Holiday {i + 1}"] = {
+            "type": "fixed",
+            "date": [toList(first), toList(min(first + timedelta(days=rng.randint(0, 2)), end))],
+        }
+        if i < compensations and weekends:
+            holidayData[f"Holiday {i + 1}"]["compensation"] = [[toList(rng.choice(weekends)), rng.randint(1, cycleDay)]]
+
+    return {
+        "Synthetic Term": {
+            "start": toList(start),
+            "end": toList(end),
+            "duration": 70,
+            "timetable": BLOCK_TIMES[:blocks],
+            "cycle": cycle,
+            "courses": courseData,
+            "holidays": holidayData,
+        }
+    }
+
+
+def generatePowerSchoolPages(courses: int = 12, seed: int = 0) -> tuple[bytes, bytes]:
+    """
+    Generate a synthetic home.html (grade table) and myschedule.html (schedule matrix) of Powerschool
+
+    Args:
+        courses(int): the number of courses
+        seed(int): the random seed
+
+    Returns:
+        tuple[bytes, bytes]: the home page and the schedule page
+    """
+    rng = random.Random(seed)
+    header: str = (
+        '<tr class="center th2"><th rowspan="2">Exp</th><th colspan="5">Last Week</th>'
+        '<th colspan="5">This Week</th><th rowspan="2">课程</th><th rowspan="2">T1</th>'
+        '<th rowspan="2">T2</th><th rowspan="2">Absences</th><th rowspan="2">Tardies</th></tr>'
+    )
+    rows: list[str] = []
+    cells: list[str] = []
+    for i in range(courses):
+        block: int = i % 5 + 1
+        rows.append(
+            f'<tr class="center" id="ccid_{1000 + i}"><td>P{block}(1-{rng.randint(1, 10)})</td>'
+            + "<td>&nbsp;</td>" * 10
+            + f'<td align="left">Course {i + 1}&nbsp;<br><span>-&nbsp;Rm:</span>&nbsp;<span>R{100 + i}</span>'
+            f'<a href="mailto:t{i}@example.com" target="_top">Email Teacher {i + 1}</a></td>'
+            f'<td><a href="#">A</a></td><td><a href="#">B+</a></td><td>{rng.randint(0, 5)}</td>'
+            f"<td>{rng.randint(0, 5)}</td></tr>"
+        )
+        hour, minute = BLOCK_TIMES[block - 1]
+        cells.append(
+            f'<td class="scheduleClass{i + 1}">Course {i + 1}<br>R{100 + i}<br>'
+            f"{(hour - 1) % 12 + 1}:{minute:02} {'PM' if hour >= 12 else 'AM'} - 00:00 PM</td>"
+        )
+    homePage: str = (
+        '<html><body class="home" id="home"><div id="content-main"><h1>Grades and Attendance</h1>'
+        f'<table class="linkDescList grid">{header}{"".join(rows)}</table></div></body></html>'
+    )
+    schedulePage: str = (
+        '<html><body><table id="tableStudentSchedMatrix"><tbody>'
+        + "".join(f"<tr>{cell}</tr>" for cell in cells)
+        + "</tbody></table></body></html>"
+    )
+    return homePage.encode(), schedulePage.encode()
+
+
+def measure(function: Callable[[], Any], repeat: int) -> dict[str, float | int]:
+    durations: list[float] = []
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return {
+        "repeat": repeat,
+        "min": min(durations),
+        "median": statistics.median(durations),
+        "mean": statistics.fmean(durations),
+    }
+
+
+def measureImportTime(module: str) -> float:
+    # "python -X importtime" reports the cumulative import time of every module in microseconds
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=Path(__file__).parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in reversed(result.stderr.splitlines()):
+        fields: list[str] = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1e6
+    raise RuntimeError(f"Cannot find the import time of {module}")
+
+
+def runBenchmarks(schedule: dict[str, dict], pages: tuple[bytes, bytes], repeat: int) -> dict[str, dict]:
+    from data import generateICS, getStrategy, parseSchedule
+    from indexParser import decodeTraditionalIndex, parsePSIndex, parsePSIndexes, ps2list, decodeFrozenTraditionalIndex
+    from powerschool import PowerSchool
+
+    dtstamp: datetime = datetime(2025, 1, 1)
+    baseConfig: dict = {
+        "name": "Benchmark",
+        "color": "#67e4fa",
+        "alarm": {"enabled": True, "before": [0, 7]},
+        "countDayInHoliday": False,
+    }
+    results: dict[str, dict] = {}
+
+    def benchmarkGenerateICS(config: dict, schedule: dict[str, dict] = schedule) -> dict:
+        # the strategy is recorded, it depends on the holidays of the schedule and on whether numpy is installed
+        strategy: str = getStrategy(parseSchedule(schedule)[0], config)
+        result: dict = measure(
+            lambda: [generateICS(term, config, dtstamp=dtstamp) for term in parseSchedule(schedule)], repeat
+        )
+        return result | {"strategy": strategy}
+
+    noHoliday: dict[str, dict] = {name: term | {"holidays": {}} for name, term in schedule.items()}
+    results["generateICS:dateRange"] = benchmarkGenerateICS(baseConfig | {"reduceFileSize": False})
+    results["generateICS:dateRange:numpy"] = benchmarkGenerateICS(
+        baseConfig | {"reduceFileSize": False, "engine": "numpy"}
+    )
+    results["generateICS:segmentedRRule"] = benchmarkGenerateICS(baseConfig | {"reduceFileSize": True})
+    results["generateICS:rrule"] = benchmarkGenerateICS(baseConfig | {"reduceFileSize": True}, noHoliday)
+
+    courses: list[dict] = [course for term in schedule.values() for course in term["courses"].values()]
+    psIndexes: list[list[str]] = [course["index"] for course in courses if isinstance(course["index"][0], str)]
+    traditionalIndexes: list[list] = [course["index"] for course in courses if isinstance(course["index"][0], list)]
+
+    def benchmarkDecoder(decoder: Callable[[Any], Any], indexes: list, *caches: Any) -> Callable[[], None]:
+        def run() -> None:
+            for index in indexes:
+                for cache in caches:  # measure the parsing itself, not the cache, every call is a miss
+                    cache.cache_clear()
+                decoder(index)
+
+        return run
+
+    def decodePS(index: list[str]) -> Any:
+        return ps2list(index, 10)
+
+    def decodeTraditional(index: list) -> Any:
+        return decodeTraditionalIndex(index, 10, 5)
+
+    results["ps2list"] = measure(benchmarkDecoder(decodePS, psIndexes * 100, parsePSIndexes, parsePSIndex), repeat)
+    benchmarkDecoder(decodePS, psIndexes)()  # warm up the cache, every measured call is a hit
+    results["ps2list:cached"] = measure(benchmarkDecoder(decodePS, psIndexes * 100), repeat)
+    results["traditionalDecoder"] = measure(
+        benchmarkDecoder(decodeTraditional, traditionalIndexes * 100, decodeFrozenTraditionalIndex), repeat
+    )
+    benchmarkDecoder(decodeTraditional, traditionalIndexes)()
+    results["traditionalDecoder:cached"] = measure(
+        benchmarkDecoder(decodeTraditional, traditionalIndexes * 100), repeat
+    )
+
+    def benchmarkPowerSchool(backend: str) -> None:
+        powerschool: PowerSchool = PowerSchool.fromPages(*pages, backend=backend)
+        powerschool.getAllCourseInformation()
+        powerschool.getTimetable()
+
+    results["powerschool:parse:bs4"] = measure(lambda: benchmarkPowerSchool("bs4"), repeat)
+    results["powerschool:parse:xpath"] = measure(lambda: benchmarkPowerSchool("xpath"), repeat)
+
+    importTime: float = measureImportTime("data")
+    results["import:data"] = {"seconds": importTime, "budget": IMPORT_TIME_BUDGET, "ok": importTime <= IMPORT_TIME_BUDGET}
+    return results
+
+
+def main() -> None:
+    cliArgumentParser = argparse.ArgumentParser(description="iSchedule benchmarks")
+    cliArgumentParser.add_argument("-o", "--output", type=str, help="JSON结果输出路径, 默认输出到标准输出")
+    cliArgumentParser.add_argument("-r", "--repeat", type=int, default=5, help="每项测试的重复次数")
+    cliArgumentParser.add_argument("--days", type=int, default=180, help="合成学期的天数")
+    cliArgumentParser.add_argument("--courses", type=int, default=12, help="合成课程数")
+    cliArgumentParser.add_argument("--holidays", type=int, default=20, help="合成假期数")
+    cliArgumentParser.add_argument("--cycle", type=int, default=2, help="每个循环的周数")
+    cliArgumentParser.add_argument("--compensations", type=int, default=2, help="合成补课日数")
+    cliArgumentParser.add_argument("--seed", type=int, default=0, help="随机种子")
+    cliArgumentParser.add_argument("--schedule", type=str, help="使用已有的schedule.json代替合成数据")
+    cliArgumentParser.add_argument("--fixtures", type=str, help="包含已保存的home.html与myschedule.html的目录")
+    cliArgumentParser.add_argument("--generate", type=str, help="仅输出合成的schedule.json到此路径")
+    cliArgs = cliArgumentParser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+
+    if cliArgs.schedule:
+        schedule: dict[str, dict] = json.loads(Path(cliArgs.schedule).read_text(encoding="utf-8"))
+    else:
+        schedule = generateSchedule(
+            days=cliArgs.days,
+            courses=cliArgs.courses,
+            holidays=cliArgs.holidays,
+            cycle=cliArgs.cycle,
+            compensations=cliArgs.compensations,
+            seed=cliArgs.seed,
+        )
+    if cliArgs.generate:
+        Path(cliArgs.generate).write_text(json.dumps(schedule, ensure_ascii=False, indent=4), encoding="utf-8")
+        return
+
+    if cliArgs.fixtures:
+        fixtures: Path = Path(cliArgs.fixtures)
+        pages: tuple[bytes, bytes] = ((fixtures / "home.html").read_bytes(), (fixtures / "myschedule.html").read_bytes())
+    else:
+        pages = generatePowerSchoolPages(courses=cliArgs.courses, seed=cliArgs.seed)
+
+    report: dict[str, Any] = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "packages": {},
+        "parameters": {key: value for key, value in vars(cliArgs).items() if key not in ("output", "generate")},
+        "results": runBenchmarks(schedule, pages, cliArgs.repeat),
+    }
+    for package in ("icalendar", "beautifulsoup4", "lxml", "numpy"):
+        try:
+            report["packages"][package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            report["packages"][package] = None
+
+    output: str = json.dumps(report, indent=4)
+    if cliArgs.output:
+        Path(cliArgs.output).write_text(output, encoding="utf-8")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
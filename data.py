@@ -1,18 +1,32 @@
 #!/usr/bin/env python3
 # coding=utf-8
 
-import itertools
+from __future__ import annotations
+
+import bisect
+import copy
+import json
 import uuid
-from datetime import datetime, time, timedelta
+from array import array
+from datetime import datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Generator
 
-import icalendar as ic
 from loguru import logger
 
-from powerschool import PowerSchool
+import profiler
+from indexParser import decodeTraditionalIndex, ps2list
 from utils import *
 
+if TYPE_CHECKING:  # icalendar is imported lazily, only when ICS is generated
+    import icalendar as ic
+
+UID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_DNS, "ischedule")  # namespace of the deterministic event UIDs
+
 
 class Location:
+    __slots__ = ("name", "latitude", "longitude")
+
     name: str
     latitude: float | str
     longitude: float | str
@@ -30,6 +44,8 @@ class Location:
 
 
 class Holiday:
+    __slots__ = ("name", "type", "start", "end", "compensations")
+
     name: str
     type: str
     start: datetime
@@ -72,6 +88,21 @@ class Holiday:
 
 
 class Term:
+    __slots__ = (
+        "name",
+        "uuid",
+        "start",
+        "end",
+        "duration",
+        "timetable",
+        "cycle",
+        "courses",
+        "holidays",
+        "__holidayStarts",
+        "__holidayEnds",
+        "__schoolDays",
+    )
+
     name: str
     uuid: str
     start: datetime
@@ -106,6 +137,24 @@ class Term:
         self.courses = []
         self.holidays = []
         self.uuid = str(uuid.uuid4())
+        self.__holidayStarts: list[datetime] = []  # merged holiday intervals, sorted by start date
+        self.__holidayEnds: list[datetime] = []
+        self.__schoolDays: dict[bool, list[tuple[datetime, int]]] = {}  # cache, keyed by countDayInHoliday
+
+    def copy(self) -> "Term":
+        """
+        Copy the term definition without its courses
+
+        The holiday index and the school-day calendars are shared with the copy,
+        so terms with an identical definition only compute them once.
+
+        Returns:
+            Term: the copied term, with no course
+        """
+        term: Term = copy.copy(self)
+        term.courses = []
+        term.holidays = list(self.holidays)
+        return term
 
     def addCourse(self, course: "Course") -> None:
         course.setCycle(self.cycle)  # set the cycle number of the course instance
@@ -113,18 +162,103 @@ class Term:
 
     def addHoliday(self, holiday: Holiday) -> None:
         self.holidays.append(holiday)
+        self.__buildHolidayIndex()
+        self.__schoolDays = {}  # the school-day calendar is outdated, copies of the term keep their own
+
+    def __buildHolidayIndex(self) -> None:
+        # merge overlapping or adjacent holidays into sorted, disjoint intervals for bisect lookups
+        starts: list[datetime] = []
+        ends: list[datetime] = []
+        for holiday in sorted(self.holidays, key=lambda holiday: holiday.start):
+            if ends and holiday.start <= ends[-1] + timedelta(days=1):
+                ends[-1] = max(ends[-1], holiday.end)
+            else:
+                starts.append(holiday.start)
+                ends.append(holiday.end)
+        self.__holidayStarts, self.__holidayEnds = starts, ends
 
     def isHoliday(self, date: datetime) -> bool:
-        for holiday in self.holidays:
-            if holiday.start <= date <= holiday.end:
-                return True
-        return False
+        i: int = bisect.bisect_right(self.__holidayStarts, date) - 1  # the last interval starting before the date
+        return i >= 0 and date <= self.__holidayEnds[i]
+
+    def getHolidayDates(self, start: datetime, end: datetime) -> list[datetime]:
+        """
+        Get every holiday date in a date range
+
+        Args:
+            start(datetime): the first date of the range
+            end(datetime): the last date of the range, inclusive
+
+        Returns:
+            list[datetime]: the sorted holiday dates in the range
+        """
+        dates: list[datetime] = []
+        i: int = max(bisect.bisect_right(self.__holidayStarts, start) - 1, 0)
+        while i < len(self.__holidayStarts) and self.__holidayStarts[i] <= end:
+            dates.extend(dateRange(max(self.__holidayStarts[i], start), min(self.__holidayEnds[i], end)))
+            i += 1
+        return dates
+
+    def getSchoolDays(self, countDayInHoliday: bool = False) -> list[tuple[datetime, int]]:
+        """
+        Build the school-day calendar of the term, it is computed once and shared by all courses
+
+        Args:
+            countDayInHoliday(bool): whether the workdays in holidays are counted by the day counter
+
+        Returns:
+            list[tuple[datetime, int]]: every non-holiday workday in the term with its day counter,
+            the cycle day of a course on that date is ``counter % course.getCycleDay() + 1``
+        """
+        if countDayInHoliday not in self.__schoolDays:
+            schoolDays: list[tuple[datetime, int]] = []
+            holidays: set[datetime] = set(self.getHolidayDates(self.start, self.end))
+            cnt: int = 0  # day counter
+            for date in dateRange(self.start, self.end):  # iterate through the term
+                if date.weekday() < 5:  # if the day is a workday
+                    if date not in holidays:  # if the day is both a workday and non-holiday
+                        schoolDays.append((date, cnt))
+                        cnt += 1
+                    elif countDayInHoliday:  # workday but holiday
+                        cnt += 1
+            self.__schoolDays[countDayInHoliday] = schoolDays
+        return self.__schoolDays[countDayInHoliday]
+
+    def getSchoolDaySegments(self, countDayInHoliday: bool = False) -> list[list[tuple[datetime, int]]]:
+        """
+        Split the school-day calendar into segments which are not interrupted by any holiday on a workday
+
+        Args:
+            countDayInHoliday(bool): whether the workdays in holidays are counted by the day counter
+
+        Returns:
+            list[list[tuple[datetime, int]]]: the consecutive school days of every segment with their day counters
+        """
+        segments: list[list[tuple[datetime, int]]] = []
+        nextWorkday: datetime | None = None
+        for date, cnt in self.getSchoolDays(countDayInHoliday):
+            if date != nextWorkday:  # at least a workday is skipped, start a new segment
+                segments.append([])
+            segments[-1].append((date, cnt))
+            nextWorkday = date + timedelta(days=3 if date.weekday() == 4 else 1)
+        return segments
+
+    def getCompensations(self) -> list[tuple[datetime, int]]:
+        """
+        Returns:
+            list[tuple[datetime, int]]: every compensation day of the term's holidays with its cycle day
+        """
+        return [
+            (compensation[0], compensation[1]) for holiday in self.holidays for compensation in holiday.compensations
+        ]
 
     def __str__(self) -> str:
         return f"Term - {self.uuid}:\n   Name: {self.name}\n   Start: {self.start}\n   End: {self.end}\n   Class Duration: {self.duration} minutes\n   Timetable: {self.timetable}\n   Cycle: {self.cycle}"
 
 
 class Course:
+    __slots__ = ("name", "teacher", "location", "index", "cycle", "__blocksByDay")
+
     name: str
     teacher: str
     location: Location
@@ -144,8 +278,10 @@ class Course:
         self.location = location
         self.index = index
         self.cycle = cycle
+        self.__blocksByDay: dict[int, list[int]] | None = None  # cache of getBlocksByDay()
 
     def setCycle(self, cycle: int) -> None:
+        self.__blocksByDay = None  # the decoded index depends on the cycle
         if self.cycle == None:  # If exceptional cycle is not set
             self.cycle = cycle  # Apply global setting
         else:  # If exceptional cycle is set
@@ -158,82 +294,66 @@ class Course:
     def getCycleDay(self) -> int:
         return self.cycle * 5
 
-    def getDecodedIndex(self, term: Term) -> list[list[int]]:
+    @profiler.profiled("decodeIndex")
+    def getDecodedIndex(self, term: Term) -> tuple[tuple[int, int], ...]:
         if isinstance(self.index[0], list):
             logger.debug("Using traditional index decoder")
-            return self.__traditionalDecoder(term)
+            logger.warning("Traditional format is deprecated, it will be removed in future releases")
+            try:
+                return decodeTraditionalIndex(self.index, self.getCycleDay(), len(term.timetable))
+            except ValueError as e:
+                raise ValueError(f'Invalid schedule file, Error processing "{term.name}.{self.name}.time", {e}') from e
         else:
             logger.debug("Using ps index decoder")
-            return PowerSchool.ps2list(self.index, self.getCycleDay())
-
-    def __traditionalDecoder(self, term: Term) -> list[list[int]]:
-        logger.warning("Traditional format is deprecated, it will be removed in future releases")
-
-        def decode_component(component: list | str | int, maximum: int):
-            """
-            Decode a component of a schedule.
-
-            Parameters:
-            - component: The component to be decoded, can be an integer, a string, or a list.
-            - maximum: The maximum value that the component can represent.
-
-            Returns:
-            - Returns a list of decoded numbers corresponding to the input component.
-            """
-            # Define a dictionary for different types of abbreviations, mapping to the corresponding number list
-            abbrDict = {
-                "odd": [i for i in range(1, maximum + 1, 2)],  # List of odd days
-                "even": [i for i in range(2, maximum + 1, 2)],  # List of even days
-                "everyday": [i for i in range(1, maximum + 1)],  # List of all days
-            }
-
-            # If the component is an integer, check if it is within the valid range
-            if isinstance(component, int):
-                if component > self.getCycleDay() or component < 1:
-                    raise ValueError(
-                        f'Invalid schedule file, Error processing "{term.name}.{self.name}.time", {component} is out of range'
-                    )
-                return [component]
-
-            # If the component is a string abbreviation, convert it to the corresponding number list
-            elif isinstance(component, str):
-                return abbrDict[component.lower()]
-
-            # If the component is a list, process each item in the list
-            elif isinstance(component, list):
-                tmp = []
-                for item in component:
-                    if isinstance(item, int):
-                        tmp.append(item)
-                    elif isinstance(item, str):
-                        tmp.extend(abbrDict[item.lower()])
-                    else:
-                        raise ValueError(
-                            f"Invalid schedule file, Error processing {term.name}.{self.name}.time, {item} can not be indentified"
-                        )
-                return tmp
-
-            # If the component is of an unsupported type, output an error message and exit
-            else:
-                raise ValueError(
-                    f"Invalid schedule file, Error processing {term.name}.{self.name}.time, {component} can not be indentified"
-                )
-
-        product: list = []
-        for timestamp in self.index:  # 求decodeTimestamp笛卡尔积
-            product.extend(
-                [
-                    list(t)
-                    for t in itertools.product(
-                        [x for x in decode_component(timestamp[0], self.cycle * 5)],
-                        [x - 1 for x in decode_component(timestamp[1], len(term.timetable))],
-                    )
-                ]
-            )
+            return ps2list(self.index, self.getCycleDay())
+
+    def getBlocksByDay(self, term: Term) -> dict[int, list[int]]:
+        """
+        Inverted index of the decoded index, it is built once from getDecodedIndex()
+
+        Args:
+            term(Term): the term which the course belongs to
+
+        Returns:
+            dict[int, list[int]]: the cycle day (starts from 1) mapped to its blocks, in decoded order
+        """
+        if self.__blocksByDay is None:
+            blocksByDay: dict[int, list[int]] = {}
+            for timestamp in self.getDecodedIndex(term):
+                blocksByDay.setdefault(timestamp[0], []).append(timestamp[1])
+            self.__blocksByDay = blocksByDay
+        return self.__blocksByDay
+
+    def getUID(self, term: Term, date: datetime, block: int, calendar: str = "") -> str:
+        """
+        Deterministic UID of an event, a regenerated calendar keeps the UIDs of its unchanged events
+
+        Args:
+            term(Term): the term which the course belongs to
+            date(datetime): the date of the event (DTSTART of a recurring event)
+            block(int): the block of the event, starts from 0
+            calendar(str): the identity of the calendar (see getCalendarId()), so the calendars of different
+                students sharing the same term and course names do not share UIDs
+
+        Returns:
+            str: the UID derived from the calendar, term, course, date and block
+        """
+        return str(
+            uuid.uuid5(UID_NAMESPACE, f"{calendar}\x00{term.name}\x00{self.name}\x00{date:%Y%m%d}\x00{block}")
+        )
 
-        return product
+    @profiler.profiled("eventify")
+    def eventify(
+        self,
+        term: Term,
+        date: datetime,
+        block: int,
+        reminderSetting: dict,
+        dtstamp: datetime | None = None,
+        uid: str | None = None,
+    ) -> ic.Event:
+        import icalendar as ic
 
-    def eventify(self, term: Term, date: datetime, block: int, reminderSetting: dict) -> ic.Event:
         event: ic.Event = ic.Event()
         event.add("summary", self.name)
         event.add(
@@ -260,8 +380,8 @@ class Course:
             )
             + timedelta(minutes=term.duration),
         )
-        event.add("dtstamp", datetime.now())
-        event.add("uid", uuid.uuid4())
+        event.add("dtstamp", dtstamp if dtstamp is not None else datetime.now())
+        event.add("uid", uid if uid is not None else self.getUID(term, date, block))
 
         if reminderSetting["enabled"] == True:
             reminder: ic.Alarm = ic.Alarm()
@@ -279,15 +399,259 @@ class Course:
         return event
 
 
-@timer
-def generateICS(term: Term, config: dict) -> bytes:
-    ics: ic.Calendar = ic.Calendar()
-    ics.add("VERSION", "2.0")
-    ics.add("PRODID", "iScheduler by @Jinyuan")
-    ics.add("CALSCALE", "GREGORIAN")
-    ics.add("X-APPLE-CALENDAR-COLOR", parseHexColor(config["color"]))
-    ics.add("X-WR-CALNAME", f"{config['name']} - {term.name}")
-    ics.add("X-WR-TIMEZONE", "Asia/Shanghai")  # TODO: add time zone support
+class OccurrenceTable:
+    """
+    Compact storage of the occurrences of a term, between the expansion and the serialization
+
+    Every occurrence is a row of three integer columns (day ordinal, block and course id),
+    so the memory grows by a few bytes per occurrence instead of a tuple of Python objects.
+    The rare occurrences with a rrule or RDATE keep them in a sparse dict keyed by the row.
+
+    Args:
+        courses(list[Course]): the courses referred to by the course ids
+    """
+
+    __slots__ = ("courses", "days", "blocks", "courseIds", "recurrences")
+
+    def __init__(self, courses: list[Course]) -> None:
+        self.courses: list[Course] = courses
+        self.days: array = array("i")  # date.toordinal()
+        self.blocks: array = array("h")
+        self.courseIds: array = array("H")
+        self.recurrences: dict[int, tuple[ic.vRecur | None, list[datetime]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def append(
+        self,
+        courseId: int,
+        date: datetime,
+        block: int,
+        rrule: ic.vRecur | None = None,
+        rdates: list[datetime] | None = None,
+    ) -> None:
+        if rrule is not None or rdates:
+            self.recurrences[len(self.days)] = (rrule, rdates if rdates else [])
+        self.days.append(date.toordinal())
+        self.blocks.append(block)
+        self.courseIds.append(courseId)
+
+    def extend(self, courseId: int, days: array, blocks: array) -> None:
+        """
+        Append the plain occurrences of a course in bulk
+
+        Args:
+            courseId(int): the index of the course in OccurrenceTable.courses
+            days(array): the day ordinals of the occurrences, typecode "i"
+            blocks(array): the blocks of the occurrences, typecode "h"
+        """
+        self.days.extend(days)
+        self.blocks.extend(blocks)
+        self.courseIds.extend(array("H", [courseId]) * len(days))
+
+    def __iter__(self) -> Generator[tuple[Course, datetime, int, ic.vRecur | None, list[datetime]], None, None]:
+        noRecurrence: tuple[None, list] = (None, [])
+        for row, (day, block, courseId) in enumerate(zip(self.days, self.blocks, self.courseIds)):
+            rrule, rdates = self.recurrences.get(row, noRecurrence)
+            yield self.courses[courseId], datetime.fromordinal(day), block, rrule, rdates
+
+
+class EventTemplate:
+    """
+    Fast VEVENT serializer of a course
+
+    The invariant parts of the event (SUMMARY, DESCRIPTION and VALARM) are rendered once,
+    only DTSTART, DTEND, DTSTAMP, UID and RRULE are formatted per occurrence.
+    The output is byte-equivalent to Course.eventify(...).to_ical().
+    """
+
+    def __init__(self, course: Course, term: Term, reminderSetting: dict) -> None:
+        from icalendar.parser import foldline
+
+        self.foldline = foldline
+        event: ic.Event = course.eventify(term, term.start, 0, reminderSetting, dtstamp=term.start, uid="")
+        self.term = term
+        self.summary: bytes = event.content_line("SUMMARY", event["SUMMARY"]).to_ical() + b"\r\n"
+        self.description: bytes = event.content_line("DESCRIPTION", event["DESCRIPTION"]).to_ical() + b"\r\n"
+        self.alarm: bytes = b"".join(reminder.to_ical() for reminder in event.subcomponents)
+
+    @staticmethod
+    def formatDatetime(dt: datetime) -> str:
+        return f"{dt.year:04}{dt.month:02}{dt.day:02}T{dt.hour:02}{dt.minute:02}{dt.second:02}"
+
+    @staticmethod
+    def formatDtstamp(dtstamp: datetime) -> str:
+        # RFC expects UTC for DTSTAMP, the same conversion as icalendar
+        if dtstamp.tzinfo is not None:
+            dtstamp = dtstamp.astimezone(timezone.utc)
+        return EventTemplate.formatDatetime(dtstamp) + "Z"
+
+    def render(
+        self,
+        date: datetime,
+        block: int,
+        dtstamp: str,
+        uid: str,
+        rrule: ic.vRecur | None = None,
+        rdates: list[datetime] | None = None,
+    ) -> bytes:
+        """
+        Render an occurrence of the course
+
+        Args:
+            date(datetime): the date of the occurrence
+            block(int): the block of the occurrence, starts from 0
+            dtstamp(str): the DTSTAMP value, formatted by EventTemplate.formatDtstamp()
+            uid(str): the UID of the event
+            rrule(ic.vRecur | None): the recurrence rule of the event
+            rdates(list[datetime] | None): the extra recurrence dates of the event, at the same time as DTSTART
+
+        Returns:
+            bytes: the VEVENT, folded and CRLF terminated
+        """
+        start: datetime = datetime.combine(date, time(self.term.timetable[block][0], self.term.timetable[block][1]))
+        end: datetime = start + timedelta(minutes=self.term.duration)
+        lines: str = (
+            f"DTSTART:{self.formatDatetime(start)}\r\n"
+            f"DTEND:{self.formatDatetime(end)}\r\n"
+            f"DTSTAMP:{dtstamp}\r\n"
+            f"{self.foldline(f'UID:{uid}')}\r\n"
+        )
+        if rrule is not None:
+            lines += f"{self.foldline(f'RRULE:{rrule.to_ical().decode()}')}\r\n"
+        if rdates:
+            rdate: str = ",".join(self.formatDatetime(datetime.combine(rdate, start.time())) for rdate in rdates)
+            lines += f"{self.foldline(f'RDATE:{rdate}')}\r\n"
+        return b"".join(
+            (b"BEGIN:VEVENT\r\n", self.summary, lines.encode(), self.description, self.alarm, b"END:VEVENT\r\n")
+        )
+
+
+def parseCourse(termName: str, courseName: str, courseData: dict) -> Course:
+    """
+    Parse a course of a schedule file into a Course instance
+
+    Args:
+        termName(str): the name of the term which the course belongs to
+        courseName(str): the name of the course
+        courseData(dict): the course field of the schedule file
+
+    Returns:
+        Course: the parsed course, its cycle is set by Term.addCourse()
+    """
+    # Term.addCourse() will automatically set the cycle to the course's cycle if it is provided
+    courseCycle: int | None = None
+    courseLocation: str | Location | None
+    if courseData.get("cycle") is not None:
+        logger.warning(
+            f'Exceptional cycle "{courseData["cycle"]}" is provided in "{termName}.{courseName}" and this will OVERRIDE the default cycle. If you see this warning UNKNOWINGLY, please remove the "cycle" field under "{termName}.courses.{courseName}"'
+        )
+
+        courseCycle = int(courseData["cycle"])
+    if courseData.get("location"):
+        if isinstance(courseData["location"], tuple) or isinstance(courseData["location"], list):
+            courseLocation = Location(*courseData["location"])
+        elif isinstance(courseData["location"], str):
+            courseLocation = Location(name=courseData["location"])
+        else:
+            logger.warning(f"Invalid 'location' is provided in \"{termName}.{courseName}\"")
+            courseLocation = None
+
+    return Course(
+        name=courseName,
+        teacher=courseData["teacher"],
+        location=courseLocation,
+        index=courseData["index"],
+        cycle=courseCycle,
+    )
+
+
+@profiler.profiled("parseSchedule")
+def parseSchedule(schedule: dict[str, dict], termCache: dict[str, Term] | None = None) -> list[Term]:
+    """
+    Parse the content of a schedule file into Term instances
+
+    Args:
+        schedule(dict[str, dict]): the parsed schedule.json
+        termCache(dict[str, Term] | None): parsed term definitions, shared between schedules.
+            A term whose definition (everything but its courses) is cached is copied instead of parsed again.
+
+    Returns:
+        list[Term]: the terms with their courses and holidays
+    """
+    terms: list[Term] = []
+    for termName, termData in schedule.items():
+        termKey: str = json.dumps(
+            [termName, {key: value for key, value in termData.items() if key != "courses"}], sort_keys=True
+        )
+        if termCache is not None and termKey in termCache:
+            tmp: Term = termCache[termKey].copy()
+        else:
+            tmp: Term = Term(
+                name=termName,
+                start=datetime(*termData["start"]),
+                end=datetime(*termData["end"]),
+                duration=termData["duration"],
+                timetable=termData["timetable"],
+                cycle=termData["cycle"],
+            )
+            if termData.get("holidays") is not None:
+                for holidayName, holidayData in termData["holidays"].items():
+                    tmp.addHoliday(
+                        Holiday(
+                            name=holidayName,
+                            type=holidayData["type"],
+                            date=[datetime(*x) for x in holidayData["date"]],
+                            compensations=(
+                                [[datetime(*x[0]), x[1]] for x in holidayData["compensation"]]
+                                if holidayData.get("compensation")
+                                else None
+                            ),
+                        )
+                    )
+            if termCache is not None:
+                termCache[termKey] = tmp.copy()
+
+        terms.append(tmp)
+        for courseName, courseData in termData["courses"].items():
+            tmp.addCourse(parseCourse(termName, courseName, courseData))
+
+    return terms
+
+
+def isNumpyAvailable() -> bool:
+    try:
+        import numpy
+    except ImportError:
+        logger.warning("numpy is not installed, using the default engine instead...")
+        return False
+    else:
+        return True
+
+
+def getCalendarId(config: dict) -> str:
+    """
+    Args:
+        config(dict): the user config
+
+    Returns:
+        str: the identity seeding the UIDs of a calendar, config["calendarId"] if it is set, otherwise its name
+    """
+    return config.get("calendarId") or config["name"]
+
+
+def getStrategy(term: Term, config: dict) -> str:
+    """
+    Choose how the occurrences of a term are expanded
+
+    Args:
+        term(Term): the term to generate occurrences for
+        config(dict): the user config
+
+    Returns:
+        str: "segmentedRRule", "numpy", "dateRange" or "rrule"
+    """
 
     def isRruleAvailable() -> bool:
         if term.holidays:
@@ -296,39 +660,141 @@ def generateICS(term: Term, config: dict) -> bytes:
             if config.get("reduceFileSize") == False:
                 return False
 
-    # If there are holidays, the rrule strategy is not gonna work effectively though
-    if isRruleAvailable():
-        if config.get("reduceFileSize") == True:
-            logger.warning(
-                "Reduce file size mode DOES NOT support holiday and countDayInHoliday functions, attempt to process in normal mode instead..."
-            )
+    # If there are holidays, the term is split into holiday-free segments with an rrule for each of them
+    if term.holidays and config.get("reduceFileSize") == True:
+        return "segmentedRRule"
+    elif isRruleAvailable() and config.get("engine") == "numpy" and isNumpyAvailable():
+        return "numpy"
+    elif isRruleAvailable():
+        return "dateRange"
+    # Else, use rrule strategy to reduce the file size and increase the performance
+    else:
+        return "rrule"
+
+
+def expandNumpyOccurrences(term: Term, config: dict) -> OccurrenceTable:
+    """
+    Date Range Strategy with numpy engine, the occurrences are written into the table without Python objects
+
+    Args:
+        term(Term): the term to generate occurrences for
+        config(dict): the user config
+
+    Returns:
+        OccurrenceTable: the occurrences, in the same order as the Date Range Strategy
+    """
+    logger.debug("Using Date Range Strategy with numpy engine")
+    from numpyEngine import expandOccurrences
+
+    table: OccurrenceTable = OccurrenceTable(term.courses)
+    compensations: list[tuple[datetime, int]] = term.getCompensations()
+    for courseId, (course, days, blocks) in enumerate(expandOccurrences(term, config.get("countDayInHoliday") == True)):
+        table.extend(courseId, days, blocks)
+
+        blocksByDay: dict[int, list[int]] = course.getBlocksByDay(term)
+        for date, day in compensations:
+            for block in blocksByDay.get(day, ()):
+                table.append(courseId, date, block)
+    return table
+
+
+def buildOccurrenceTable(term: Term, config: dict) -> OccurrenceTable:
+    """
+    Expand the occurrences of a term into an OccurrenceTable
+
+    Args:
+        term(Term): the term to generate occurrences for
+        config(dict): the user config
+
+    Returns:
+        OccurrenceTable: the occurrences, in the order they appear in the ICS file
+    """
+    if getStrategy(term, config) == "numpy":
+        return expandNumpyOccurrences(term, config)
+    table: OccurrenceTable = OccurrenceTable(term.courses)
+    courseIds: dict[int, int] = {id(course): courseId for courseId, course in enumerate(term.courses)}
+    for course, date, block, rrule, rdates in iterOccurrences(term, config):
+        table.append(courseIds[id(course)], date, block, rrule, rdates)
+    return table
+
+
+def iterOccurrences(
+    term: Term, config: dict
+) -> Generator[tuple[Course, datetime, int, ic.vRecur | None, list[datetime]], None, None]:
+    """
+    Yield the occurrences of a term one by one, in the order they appear in the ICS file
+
+    Args:
+        term(Term): the term to generate occurrences for
+        config(dict): the user config
+
+    Yields:
+        tuple[Course, datetime, int, ic.vRecur | None, list[datetime]]:
+            the course, date, block, rrule (if any) and extra recurrence dates (RDATE) of the occurrence
+    """
+    import icalendar as ic
+
+    strategy: str = getStrategy(term, config)
+    if strategy == "segmentedRRule":
+        logger.warning("Tips - Reduce file size mode is enabled, some features may not supported")
+        logger.debug("Using Segmented RRule Strategy")
+        segments: list[list[tuple[datetime, int]]] = term.getSchoolDaySegments(config.get("countDayInHoliday") == True)
+        compensations: list[tuple[datetime, int]] = term.getCompensations()
+        for course in term.courses:
+            cycleDay: int = course.getCycleDay()
+            period: timedelta = timedelta(weeks=course.cycle)  # a segment repeats itself every cycle
+            blocksByDay: dict[int, list[int]] = course.getBlocksByDay(term)
+
+            # compensation days are attached as RDATE to the first event with the same block
+            rdatesByBlock: dict[int, list[datetime]] = {}
+            for date, day in compensations:
+                for block in blocksByDay.get(day, ()):
+                    rdatesByBlock.setdefault(block, []).append(date)
+
+            for segment in segments:
+                segmentEnd: datetime = segment[-1][0]
+                # occurrences sharing a block and a week are merged into a single multi-BYDAY rrule
+                weeks: dict[tuple[int, datetime], list[datetime]] = {}
+                for date, cnt in segment:
+                    if date >= segment[0][0] + period:  # the rest of the segment is covered by the rrules
+                        break
+                    for block in blocksByDay.get(cnt % cycleDay + 1, ()):
+                        weeks.setdefault((block, date - timedelta(days=date.weekday())), []).append(date)
+
+                for (block, _), dates in weeks.items():
+                    rrule: ic.vRecur | None = None
+                    if len(dates) > 1 or dates[0] + period <= segmentEnd:
+                        rrule = ic.vRecur(
+                            freq="weekly",
+                            interval=course.cycle,
+                            byday=[day2str(weekday + 1) for weekday in sorted({date.weekday() for date in dates})],
+                            until=datetime.combine(segmentEnd, time(23, 59, 59)),
+                        )
+                        logger.debug(f"Adding {course.name} with rrule:{rrule}")
+                    yield course, dates[0], block, rrule, rdatesByBlock.pop(block, [])
+
+            for block, rdates in rdatesByBlock.items():  # compensation days without an event to attach to
+                for date in rdates:
+                    yield course, date, block, None, []
+
+    elif strategy == "numpy":
+        yield from expandNumpyOccurrences(term, config)
+
+    elif strategy == "dateRange":
         logger.debug("Using Date Range Strategy")
+        schoolDays: list[tuple[datetime, int]] = term.getSchoolDays(config.get("countDayInHoliday") == True)
+        compensations: list[tuple[datetime, int]] = term.getCompensations()
         for course in term.courses:  # iterate through all courses
-            cnt: int = 0  # day counter
-            timetable: list[list[int]] = course.getDecodedIndex(term)
-            for date in dateRange(term.start, term.end):  # iterate through the term
-                if date.weekday() < 5:  # if the day is a workday
-                    if cnt >= course.getCycleDay():  # if the day counter overflow, reset the counter
-                        cnt = 0
-                    if not term.isHoliday(date):  # if the day is both a workday and non-holiday
-                        for timestamp in timetable:
-                            if timestamp[0] - 1 == cnt:
-                                event: ic.Event = course.eventify(term, date, timestamp[1], config["alarm"])
-
-                                ics.add_component(event)
-                        cnt += 1
-                    else:  # workday but holiday
-                        if config.get("countDayInHoliday") == True:
-                            cnt += 1
+            cycleDay: int = course.getCycleDay()
+            blocksByDay: dict[int, list[int]] = course.getBlocksByDay(term)
+            for date, cnt in schoolDays:  # iterate through the school days of the term
+                for block in blocksByDay.get(cnt % cycleDay + 1, ()):
+                    yield course, date, block, None, []
 
-            for holiday in term.holidays:
-                for compensation in holiday.compensations:
-                    for timestamp in timetable:
-                        if timestamp[0] == compensation[1]:
-                            event = course.eventify(term, compensation[0], timestamp[1], config["alarm"])
-                            ics.add_component(event)
+            for date, day in compensations:
+                for block in blocksByDay.get(day, ()):
+                    yield course, date, block, None, []
 
-    # Else, use rrule strategy to reduce the file size and increase the performance
     else:
         logger.warning("Tips - Reduce file size mode is enabled, some features may not supported")
         logger.debug("Using RRule Strategy")
@@ -339,26 +805,151 @@ def generateICS(term: Term, config: dict) -> bytes:
             # 如果用户输入的起始日期是双休日，则rrule从 下周 周一起算
             initDay: datetime = term.start + timedelta(days=(7 - term.start.weekday()))
         for course in term.courses:
-            timetable = course.getDecodedIndex(term)
-            for timestamp in timetable:
+            # occurrences sharing a block and a cycle week are merged into a single multi-BYDAY rrule
+            weeks: dict[tuple[int, int], list[int]] = {}
+            for timestamp in course.getDecodedIndex(term):
                 weekInfo: list[int] = getWeekInfo(timestamp[0])
-                event: ic.Event = course.eventify(
-                    term,
-                    initDay + timedelta(weeks=weekInfo[1], days=weekInfo[0] - 1),
-                    timestamp[1],
-                    config["alarm"],
-                )
+                weeks.setdefault((timestamp[1], weekInfo[1]), []).append(weekInfo[0])
+
+            for (block, week), days in weeks.items():
+                days = sorted(set(days))
                 rrule = ic.vRecur(
                     freq="weekly",
                     interval=course.cycle,
-                    byday=day2str(weekInfo[0]),
+                    byday=[day2str(day) for day in days],
                     until=term.end,
-                )  # TODO: work around, try to merge some rrule which are in the same week
+                )
                 logger.debug(f"Adding {course.name} with rrule:{rrule}")
-                event.add("RRULE", rrule)
-                ics.add_component(event)
+                yield course, initDay + timedelta(weeks=week, days=days[0] - 1), block, rrule, []
+
+
+def iterEvents(term: Term, config: dict, dtstamp: datetime | None = None) -> Generator[ic.Event, None, None]:
+    """
+    Yield the events of a term one by one, in the order they appear in the ICS file
+
+    Args:
+        term(Term): the term to generate events for
+        config(dict): the user config
+        dtstamp(datetime | None): the DTSTAMP shared by all events, defaults to now
+
+    Yields:
+        ic.Event: the events of the term
+    """
+    dtstamp = dtstamp if dtstamp is not None else datetime.now()
+    for course, date, block, rrule, rdates in profiler.iterate("expand", iterOccurrences(term, config)):
+        uid: str = course.getUID(term, date, block, getCalendarId(config))
+        event: ic.Event = course.eventify(term, date, block, config["alarm"], dtstamp=dtstamp, uid=uid)
+        if rrule is not None:
+            event.add("RRULE", rrule)
+        if rdates:
+            event.add("RDATE", [datetime.combine(rdate, event["DTSTART"].dt.time()) for rdate in rdates])
+        yield event
+
+
+def streamICS(
+    term: Term,
+    config: dict,
+    fast: bool = True,
+    dtstamp: datetime | None = None,
+    table: OccurrenceTable | None = None,
+) -> Generator[bytes, None, None]:
+    """
+    Serialize a term into ICS chunks without holding the whole calendar in memory
+
+    Args:
+        term(Term): the term to generate ICS for
+        config(dict): the user config
+        fast(bool): serialize the events with EventTemplate instead of building icalendar objects
+        dtstamp(datetime | None): the DTSTAMP shared by all events of the generation run, defaults to now
+        table(OccurrenceTable | None): the expanded occurrences of the term, e.g. from a compiled artifact,
+            they are expanded again if None. Only used when fast is True
+
+    Yields:
+        bytes: the calendar header, every folded and CRLF terminated VEVENT, and the calendar footer
+    """
+    import icalendar as ic
+
+    ics: ic.Calendar = ic.Calendar()
+    ics.add("VERSION", "2.0")
+    ics.add("PRODID", "iScheduler by @Jinyuan")
+    ics.add("CALSCALE", "GREGORIAN")
+    ics.add("X-APPLE-CALENDAR-COLOR", parseHexColor(config["color"]))
+    ics.add("X-WR-CALNAME", f"{config['name']} - {term.name}")
+    ics.add("X-WR-TIMEZONE", "Asia/Shanghai")  # TODO: add time zone support
+
+    dtstamp = dtstamp if dtstamp is not None else datetime.now()
+    footer: bytes = b"END:VCALENDAR\r\n"
+    yield ics.to_ical().removesuffix(footer)
+    if fast:
+        templates: dict[int, EventTemplate] = {}
+        formattedDtstamp: str = EventTemplate.formatDtstamp(dtstamp)
+        if table is None:
+            with profiler.span("expand"):
+                table = buildOccurrenceTable(term, config)
+        for course, date, block, rrule, rdates in table:
+            with profiler.span("serialize"):
+                if id(course) not in templates:
+                    templates[id(course)] = EventTemplate(course, term, config["alarm"])
+                uid: str = course.getUID(term, date, block, getCalendarId(config))
+                chunk: bytes = templates[id(course)].render(date, block, formattedDtstamp, uid, rrule, rdates)
+            yield chunk
+    else:
+        for event in iterEvents(term, config, dtstamp):
+            with profiler.span("serialize"):
+                chunk = event.to_ical()
+            yield chunk
+    yield footer
+
+
+@timer
+def writeICS(
+    term: Term,
+    config: dict,
+    file: BinaryIO,
+    fast: bool = True,
+    dtstamp: datetime | None = None,
+    table: OccurrenceTable | None = None,
+) -> None:
+    for chunk in streamICS(term, config, fast, dtstamp, table):
+        with profiler.span("write"):
+            file.write(chunk)
+
+
+def exportICS(
+    term: Term, config: dict, path: Path, dtstamp: datetime | None = None, table: OccurrenceTable | None = None
+) -> Path:
+    """
+    Write the ICS file of a term, a partially written file is removed if the generation fails
+
+    Args:
+        term(Term): the term to generate ICS for
+        config(dict): the user config
+        path(Path): the path of the ICS file
+        dtstamp(datetime | None): the DTSTAMP shared by all events of the generation run, defaults to now
+        table(OccurrenceTable | None): the expanded occurrences of the term, expanded again if None
+
+    Returns:
+        Path: the path of the ICS file
+    """
+    try:
+        with open(path, "wb") as f:
+            # events are streamed into the file as they are generated
+            writeICS(term, config, f, dtstamp=dtstamp, table=table)
+    except Exception as e:
+        path.unlink(missing_ok=True)
+        raise e
+    return path
+
 
-    return ics.to_ical()
+@timer
+def generateICS(
+    term: Term,
+    config: dict,
+    fast: bool = True,
+    dtstamp: datetime | None = None,
+    table: OccurrenceTable | None = None,
+) -> bytes:
+    return b"".join(streamICS(term, config, fast, dtstamp, table))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+import re
+from functools import lru_cache
+
+from loguru import logger
+
+PS_INDEX_PATTERN = re.compile(r"p(?P<block>[^(]*)\((?P<components>.*)\)")  # e.g. "p3(a-e)", "p1(1-3,odd)"
+PARSER_CACHE_SIZE = 4096  # the same few index strings repeat across the schedules of a batch
+
+Timestamp = tuple[int, int]  # (cycle day, block), the cycle day starts from 1 and the block starts from 0
+
+
+@lru_cache(maxsize=64)
+def getAbbreviations(maximum: int) -> dict[str, tuple[int, ...]]:
+    """
+    Get the abbreviations of an index component
+
+    Args:
+        maximum(int): the maximum value that a component can represent
+
+    Returns:
+        dict[str, tuple[int, ...]]: the abbreviations mapped to the numbers they represent
+    """
+    return {
+        "odd": tuple(range(1, maximum + 1, 2)),  # List of odd days
+        "even": tuple(range(2, maximum + 1, 2)),  # List of even days
+        "everyday": tuple(range(1, maximum + 1)),  # List of all days
+    }
+
+
+def ps2list(psIndex: str | list, cycle: int) -> tuple[Timestamp, ...]:
+    """
+    Decode Powerschool indexes, e.g. "P3(1-4,7)", the results are cached by (index, cycle)
+
+    Args:
+        psIndex(str | list): a Powerschool index or a list of them
+        cycle(int): the number of days in a cycle
+
+    Returns:
+        tuple[Timestamp, ...]: the decoded (cycle day, block) pairs
+    """
+    return parsePSIndexes((psIndex,) if isinstance(psIndex, str) else tuple(psIndex), cycle)
+
+
+@lru_cache(maxsize=PARSER_CACHE_SIZE)
+def parsePSIndexes(psIndexes: tuple[str, ...], cycle: int) -> tuple[Timestamp, ...]:
+    parsedIndex: list[Timestamp] = []
+    for psIndex in psIndexes:
+        parsedIndex.extend(parsePSIndex(psIndex, cycle))
+    return tuple(parsedIndex)
+
+
+@lru_cache(maxsize=PARSER_CACHE_SIZE)
+def parsePSIndex(psIndex: str, cycle: int) -> tuple[Timestamp, ...]:
+    psIndex = psIndex.strip().lower()  # trim the trailing and leading spaces
+    if psIndex.find("(") == -1 or psIndex.rfind(")") == -1:
+        # can not find parentheses
+        raise ValueError("Invalid Powerschool index format, cannot find parentheses")
+    if psIndex.startswith("hr"):
+        raise ValueError(
+            'PS index starts with "hr", do you mean "Homeroom"? It isn\'t currently supported by PS Connector'
+        )
+    if not psIndex.startswith("p"):
+        raise ValueError("Invalid Powerschool index format, it should startwith 'P'")
+
+    match: re.Match | None = PS_INDEX_PATTERN.match(psIndex)
+    if match is None:
+        raise ValueError(f'Invalid Powerschool index format, cannot parse "{psIndex}"')
+    try:
+        block: int = int(match["block"]) if match["block"].strip() else -1
+    except ValueError:
+        block = -1
+    if block < 0:
+        raise ValueError("Invalid Powerschool index format, block number is invalid or out of range")
+
+    parsedIndex: list[Timestamp] = []
+    for component in match["components"].split(","):
+        parsedIndex.extend((day, block - 1) for day in parsePSComponent(component, cycle, psIndex))
+    return tuple(parsedIndex)
+
+
+def parsePSComponent(component: str, cycle: int, psIndex: str) -> tuple[int, ...]:
+    component = component.strip()  # trim the leading and trailing whitespace
+
+    dashIndex: int = component.find("-")  # if the component is a range
+    if dashIndex != -1:  # is range
+        # filling the range
+        leftBound, rightBound = int(component[:dashIndex]), int(component[dashIndex + 1 :])
+        if leftBound > rightBound:
+            raise ValueError(
+                f'Invalid schedule file, Error processing "{psIndex}", "{leftBound}-{rightBound}" is out of range'
+            )
+        return tuple(range(leftBound, rightBound + 1))
+
+    else:  # not range
+        if component.isdigit():
+            return (int(component),)
+        elif component in getAbbreviations(cycle):
+            return getAbbreviations(cycle)[component]
+        else:
+            raise ValueError(f'Invalid Powerschool index format, cannot parse component "{component}"')
+
+
+def freezeIndex(index: list | tuple | str | int) -> tuple | str | int:
+    # lists are not hashable, convert them into tuples to be used as cache keys
+    if isinstance(index, (list, tuple)):
+        return tuple(freezeIndex(item) for item in index)
+    return index
+
+
+def decodeTraditionalIndex(index: list, cycle: int, blockCount: int) -> tuple[Timestamp, ...]:
+    """
+    Decode traditional indexes, e.g. [["odd", 1], [[1, 6], 3]], the results are cached by (index, cycle)
+
+    Args:
+        index(list): the traditional index of a course
+        cycle(int): the number of days in a cycle
+        blockCount(int): the number of blocks in a day
+
+    Returns:
+        tuple[Timestamp, ...]: the decoded (cycle day, block) pairs
+    """
+    return decodeFrozenTraditionalIndex(freezeIndex(index), cycle, blockCount)
+
+
+@lru_cache(maxsize=PARSER_CACHE_SIZE)
+def decodeFrozenTraditionalIndex(index: tuple, cycle: int, blockCount: int) -> tuple[Timestamp, ...]:
+    product: list[Timestamp] = []
+    for timestamp in index:  # 求decodeTimestamp笛卡尔积
+        days: tuple[int, ...] = decodeTraditionalComponent(timestamp[0], cycle)
+        blocks: tuple[int, ...] = decodeTraditionalComponent(timestamp[1], blockCount)
+        product.extend((day, block - 1) for day in days for block in blocks)
+    return tuple(product)
+
+
+def decodeTraditionalComponent(component: tuple | str | int, maximum: int) -> tuple[int, ...]:
+    """
+    Decode a component of a schedule.
+
+    Parameters:
+    - component: The component to be decoded, can be an integer, a string, or a list.
+    - maximum: The maximum value that the component can represent.
+
+    Returns:
+    - Returns the decoded numbers corresponding to the input component.
+    """
+    abbrDict: dict[str, tuple[int, ...]] = getAbbreviations(maximum)
+
+    # If the component is an integer, check if it is within the valid range
+    if isinstance(component, int):
+        if component > maximum or component < 1:
+            raise ValueError(f"{component} is out of range")
+        return (component,)
+
+    # If the component is a string abbreviation, convert it to the corresponding numbers
+    elif isinstance(component, str) and component.lower() in abbrDict:
+        return abbrDict[component.lower()]
+
+    # If the component is a list, process each item in the list
+    elif isinstance(component, tuple):
+        tmp: list[int] = []
+        for item in component:
+            if isinstance(item, int):
+                tmp.append(item)
+            elif isinstance(item, str) and item.lower() in abbrDict:
+                tmp.extend(abbrDict[item.lower()])
+            else:
+                raise ValueError(f"{item} can not be indentified")
+        return tuple(tmp)
+
+    # If the component is of an unsupported type, raise an error
+    else:
+        raise ValueError(f"{component} can not be indentified")
+
+
+if __name__ == "__main__":
+    logger.warning("This module cannot run independently")
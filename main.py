@@ -1,126 +1,339 @@
 #!/usr/bin/env python3
 # coding=utf-8
 import argparse
+import json
 import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import Any, Generator
 
 from loguru import logger
-from tqdm import tqdm, trange
 
-from data import Location, Term, Course, Holiday, generateICS
+import profiler
+from artifactCache import ArtifactCache, CompiledTerm, compileTerm, getFileDigest
+from data import OccurrenceTable, Term, exportICS, parseSchedule
 from utils import *
 
 # TODO: SchedCapsule
 
 VERSION = "3.2.5"
-# CLI Arguments Def
-cliArgumentParser = argparse.ArgumentParser(description="iSchedule")
-cliArgumentParser.add_argument("-v", "--version", action="store_true", help="显示版本")
-cliArgumentParser.add_argument("-nl", "--nolog", action="store_true", help="不显示警告与提示信息")
-cliArgumentParser.add_argument("-c", "--config", type=str, help="配置文件路径")
-cliArgumentParser.add_argument("-s", "--schedule", type=str, help="JSON时间配置文件路径")
-cliArgumentParser.add_argument("-o", "--output", type=str, help="输出目录")
-cliArgs = cliArgumentParser.parse_args()
-if cliArgs.version:  # show version information and exit
-    print(f"iSchedule {VERSION}")
-    exit(0)
-
-config: dict = {}
-cliConfig: dict[str, Any] = {
-    "logLevel": "ERROR" if cliArgs.nolog else "INFO",
-    "configPath": (Path(cliArgs.config) if cliArgs.config else Path.cwd() / "config.json").resolve(),
-    "schedulePath": (Path(cliArgs.schedule) if cliArgs.schedule else Path.cwd() / "schedule.json").resolve(),
-    "outputPath": (Path(cliArgs.output) if cliArgs.output else Path.cwd()).resolve(),
-}
-config.update(cliConfig)
-
-# initialize logger
-logger.remove()
-logger.add(lambda msg: tqdm.write(msg, end=""), level=config["logLevel"], colorize=True)
-logger.info(f"iSchedule {VERSION}")
-
-config.update(loadJSON(config["configPath"]))
-if not os.path.exists(config["schedulePath"]):
-    # fall back when default path is not exists.
-    logger.warning(f"{config["schedulePath"]} does not exist")
-    config["schedulePath"] = Path(input("ENTER the schedule file path: ").strip("\"'")).resolve()
-schedule: dict[dict] = loadJSON(config["schedulePath"])
-
-# parse schedule file into objects
-terms: list[Term] = []
-for termName, termData in schedule.items():
-    tmp: Term = Term(
-        name=termName,
-        start=datetime(*termData["start"]),
-        end=datetime(*termData["end"]),
-        duration=termData["duration"],
-        timetable=termData["timetable"],
-        cycle=termData["cycle"],
+
+
+def parseArguments() -> argparse.Namespace:
+    # CLI Arguments Def
+    cliArgumentParser = argparse.ArgumentParser(description="iSchedule")
+    cliArgumentParser.add_argument("-v", "--version", action="store_true", help="显示版本")
+    cliArgumentParser.add_argument("-nl", "--nolog", action="store_true", help="不显示警告与提示信息")
+    cliArgumentParser.add_argument("-c", "--config", type=str, help="配置文件路径")
+    cliArgumentParser.add_argument("-s", "--schedule", type=str, help="JSON时间配置文件路径")
+    cliArgumentParser.add_argument("-o", "--output", type=str, help="输出目录")
+    cliArgumentParser.add_argument("-j", "--jobs", type=int, default=1, help="并行生成ICS文件的进程数")
+    cliArgumentParser.add_argument(
+        "-b", "--batch", type=str, help="批量生成: 每个学生一个子目录(schedule.json/config.json)的目录, 或JSONL文件"
     )
-    terms.append(tmp)
-    for courseName, courseData in termData["courses"].items():
-        # Term.addCourse() will automatically set the cycle to the course's cycle if it is provided
-        courseCycle: int | None = None
-        courseLocation: str | Location | None
-        if courseData.get("cycle") is not None:
-            logger.warning(
-                f'Exceptional cycle "{courseData["cycle"]}" is provided in "{termName}.{courseName}" and this will OVERRIDE the default cycle. If you see this warning UNKNOWINGLY, please remove the "cycle" field under "{termName}.courses.{courseName}"'
-            )
-
-            courseCycle = int(courseData["cycle"])
-        if courseData.get("location"):
-            if isinstance(courseData["location"], tuple) or isinstance(courseData["location"], list):
-                courseLocation = Location(*courseData["location"])
-            elif isinstance(courseData["location"], str):
-                courseLocation = Location(name=courseData["location"])
+    cliArgumentParser.add_argument("--serve", type=int, metavar="PORT", help="以HTTP/webcal订阅源提供ICS, 监听此端口")
+    cliArgumentParser.add_argument("--host", type=str, default="127.0.0.1", help="--serve 监听的地址")
+    cliArgumentParser.add_argument("--profile", type=str, help="记录各阶段的次数与耗时, 以JSON输出到此路径")
+    cliArgumentParser.add_argument("--cprofile", type=str, help="使用cProfile运行, 统计结果(pstats)输出到此路径")
+    cliArgumentParser.add_argument(
+        "--no-compile-cache", action="store_true", help="不使用编译缓存, 重新解析课程表并生成全部ICS文件"
+    )
+    return cliArgumentParser.parse_args()
+
+
+def getOutputPath(config: dict, term: Term) -> Path:
+    return getChildPath(config["outputPath"], f"{config['name']} - {term.name}.ics")
+
+
+def setDefaultName(config: dict) -> None:
+    """
+    Name an unnamed calendar, the timestamped name keeps the files of different runs apart,
+    while the UIDs are seeded with the name of the schedule file so they are the same on every run
+
+    Args:
+        config(dict): the user config with "schedulePath", it is modified in place
+    """
+    if config["name"] == "":
+        config["calendarId"] = Path(config["schedulePath"]).stem
+        config["name"] = f"Schedule-{datetime.now().strftime('%X-%Y.%m.%d')}"
+
+
+def iterBatch(path: Path) -> Generator[tuple[str, dict, dict], None, None]:
+    """
+    Read the schedules and configs of a batch
+
+    A batch is either a directory with a subdirectory for every student,
+    each containing a schedule.json and optionally a config.json,
+    or a JSONL file with a {"name": ..., "schedule": {...}, "config": {...}} object on every line.
+
+    Args:
+        path(Path): the batch directory or JSONL file
+
+    Yields:
+        tuple[str, dict, dict]: the name, schedule and config (may be empty) of every student
+    """
+    if path.is_dir():
+        for studentPath in sorted(item for item in path.iterdir() if item.is_dir()):
+            configPath: Path = studentPath / "config.json"
+            try:
+                with profiler.span("loadJSON"):
+                    schedule: dict = loadJSON(studentPath / "schedule.json")
+                    studentConfig: dict = loadJSON(configPath) if configPath.exists() else {}
+            except Exception as e:
+                logger.error(f'Failed to read the batch entry "{studentPath.name}", skipped: {e}')
             else:
-                logger.warning(f"Invalid 'location' is provided in \"{termName}.{courseName}\"")
-                courseLocation = None
-
-        tmp.addCourse(
-            Course(
-                name=courseName,
-                teacher=courseData["teacher"],
-                location=courseLocation,
-                index=courseData["index"],
-                cycle=courseCycle,
-            )
-        )
+                yield studentPath.name, schedule, studentConfig
+    else:
+        with path.open(encoding="utf-8") as f:
+            for lineNumber, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    with profiler.span("loadJSON"):
+                        record: dict = json.loads(line)
+                    studentName: str = record.get("name", f"{path.stem}-{lineNumber}")
+                    yield studentName, record["schedule"], record.get("config", {})
+                except (json.JSONDecodeError, KeyError, AttributeError) as e:
+                    logger.error(f"Failed to read line {lineNumber} of {path}, skipped: {e}")
 
-    if termData.get("holidays") is not None:
-        for holidayName, holidayData in termData["holidays"].items():
-            tmp.addHoliday(
-                Holiday(
-                    name=holidayName,
-                    type=holidayData["type"],
-                    date=[datetime(*x) for x in holidayData["date"]],
-                    compensations=(
-                        [[datetime(*x[0]), x[1]] for x in holidayData["compensation"]]
-                        if holidayData.get("compensation")
-                        else None
-                    ),
-                )
-            )
 
-print("\n")
+def loadBatch(path: Path, config: dict) -> list[tuple[Term, dict]]:
+    """
+    Parse every schedule of a batch, identical term definitions are parsed once and shared between students
+
+    Args:
+        path(Path): the batch directory or JSONL file
+        config(dict): the global config, overridden by the config of each student
+
+    Returns:
+        list[tuple[Term, dict]]: the terms of all students with their config
+    """
+    tasks: list[tuple[Term, dict]] = []
+    termCache: dict[str, Term] = {}
+    for studentName, schedule, studentConfig in iterBatch(path):
+        try:
+            # the calendars of the students are told apart by their names, the global name is not used
+            studentConfig = config | studentConfig | {"name": studentConfig.get("name") or studentName}
+            studentConfig["outputPath"] = getChildPath(config["outputPath"], studentName)
+            studentConfig["outputPath"].mkdir(parents=True, exist_ok=True)
+            tasks.extend((term, studentConfig) for term in parseSchedule(schedule, termCache))
+        except Exception as e:
+            logger.error(f'Failed to parse the schedule of "{studentName}", skipped: {e}')
+
+    logger.info(f"{len(tasks)} terms are loaded from {path}, {len(termCache)} of them are unique")
+    return tasks
+
+
+def generateTerm(
+    term: Term, config: dict, dtstamp: datetime, profile: bool = False, table: OccurrenceTable | None = None
+) -> tuple[list[str], dict[str, dict]]:
+    """
+    Generate the ICS file of a term in a worker process
+
+    Args:
+        term(Term): the term to generate ICS for
+        config(dict): the user config
+        dtstamp(datetime): the DTSTAMP shared by all events of the generation run
+        profile(bool): whether the phases of the generation are recorded
+        table(OccurrenceTable | None): the expanded occurrences of the term, expanded again if None
+
+    Returns:
+        tuple[list[str], dict[str, dict]]: the log messages of the worker and the spans it recorded,
+        they are printed and merged by the main process to keep the output coherent
+    """
+    messages: list[str] = []
+    logger.remove()
+    logger.add(lambda msg: messages.append(str(msg)), level=config["logLevel"], colorize=True)
+    profiler.enable(profile)
+    profiler.reset()  # a worker process is reused by several terms
+    exportICS(term, config, getOutputPath(config, term), dtstamp, table)
+    return messages, profiler.getSpans()
+
+
+def generateTerms(
+    tasks: list[tuple[Term, dict]],
+    dtstamp: datetime,
+    jobs: int,
+    tables: list[OccurrenceTable | None] | None = None,
+) -> Generator[tuple[int, Exception | None], None, None]:
+    """
+    Generate the ICS files of all terms, concurrently if more than one job is requested
+
+    Args:
+        tasks(list[tuple[Term, dict]]): the terms with their config
+        dtstamp(datetime): the DTSTAMP shared by all events of the generation run
+        jobs(int): the number of worker processes
+        tables(list[OccurrenceTable | None] | None): the expanded occurrences of every task, expanded again if None
+
+    Yields:
+        tuple[int, Exception | None]: the index of a finished task and the exception raised by its generation, if any
+    """
+    tables = tables if tables is not None else [None] * len(tasks)
+    if jobs <= 1 or not tasks:
+        for i, (term, config) in enumerate(tasks):
+            try:
+                exportICS(term, config, getOutputPath(config, term), dtstamp, tables[i])
+            except Exception as e:
+                yield i, e
+            else:
+                yield i, None
+        return
+
+    from tqdm import tqdm
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as executor:
+        futures: dict[Future, int] = {
+            executor.submit(generateTerm, term, config, dtstamp, profiler.isEnabled(), tables[i]): i
+            for i, (term, config) in enumerate(tasks)
+        }
+        for future in as_completed(futures):
+            try:
+                messages, spans = future.result()
+            except Exception as e:
+                yield futures[future], e
+            else:
+                profiler.mergeSpans(spans)
+                for message in messages:
+                    tqdm.write(message, end="")
+                yield futures[future], None
 
-# parse userConfig file
-config["name"] = config["name"] if config["name"] != "" else f"Schedule-{datetime.now().strftime('%X-%Y.%m.%d')}"
 
-for i in trange(len(terms), desc="Total: "):
-    try:
-        ics = generateICS(terms[i], config)
-        config["outputPath"] = (config["outputPath"] / f"{config['name']} - {terms[i].name}.ics").resolve()
-        with open(config["outputPath"], "wb") as f:
-            f.write(ics)
-    except Exception as e:
-        logger.error(f"[{i + 1} of {len(terms)}] Failed to generate ICS file - {config["name"]} - {terms[i].name}.ics")
+def main() -> None:
+    cliArgs = parseArguments()
+    if cliArgs.version:  # show version information and exit
+        print(f"iSchedule {VERSION}")
+        exit(0)
+
+    if cliArgs.cprofile:
+        import cProfile
+
+        # only the main process is profiled, use it with "-j 1" to see the generation itself
+        with cProfile.Profile() as cliProfiler:
+            run(cliArgs)
+        cliProfiler.dump_stats(cliArgs.cprofile)
+        logger.info(f"cProfile statistics are written to {Path(cliArgs.cprofile).resolve()}")
     else:
-        logger.success(
-            f"[{i + 1} of {len(terms)}] Successfully generated ICS file - {config["name"]} - {terms[i].name}.ics"
+        run(cliArgs)
+
+
+def run(cliArgs: argparse.Namespace) -> None:
+    profiler.enable(bool(cliArgs.profile))
+    runStart: float = time.perf_counter()
+
+    from tqdm import tqdm  # imported lazily, it is not needed by --version
+
+    config: dict = {}
+    cliConfig: dict[str, Any] = {
+        "logLevel": "ERROR" if cliArgs.nolog else "INFO",
+        "configPath": (Path(cliArgs.config) if cliArgs.config else Path.cwd() / "config.json").resolve(),
+        "schedulePath": (Path(cliArgs.schedule) if cliArgs.schedule else Path.cwd() / "schedule.json").resolve(),
+        "outputPath": (Path(cliArgs.output) if cliArgs.output else Path.cwd()).resolve(),
+    }
+    config.update(cliConfig)
+
+    # initialize logger
+    logger.remove()
+    logger.add(lambda msg: tqdm.write(msg, end=""), level=config["logLevel"], colorize=True)
+    logger.info(f"iSchedule {VERSION}")
+
+    with profiler.span("loadJSON"):
+        config.update(loadJSON(config["configPath"]))
+    if cliArgs.serve is not None:
+        from server import serve
+
+        serve(
+            cliArgs.host,
+            cliArgs.serve,
+            config,
+            schedulePath=config["schedulePath"],
+            batchPath=Path(cliArgs.batch).resolve() if cliArgs.batch else None,
         )
+        return
+    artifactCache: ArtifactCache | None = None
+    artifactKey: str | None = None
+    compiledTerms: list[CompiledTerm] | None = None  # only a single schedule is compiled, a batch is not
+    if cliArgs.batch:
+        tasks: list[tuple[Term, dict]] = loadBatch(Path(cliArgs.batch).resolve(), config)
+    else:
+        if not os.path.exists(config["schedulePath"]):
+            # fall back when default path is not exists.
+            logger.warning(f"{config["schedulePath"]} does not exist")
+            config["schedulePath"] = Path(input("ENTER the schedule file path: ").strip("\"'")).resolve()
+        if not cliArgs.no_compile_cache:
+            # the key is taken before the default name is filled in, it changes on every run
+            artifactCache = ArtifactCache(Path.cwd() / ".ischedule_cache", VERSION)
+            artifactKey = artifactCache.getKey(config["schedulePath"].read_bytes(), config)
+            compiledTerms = artifactCache.load(artifactKey)
+
+        # parse userConfig file
+        setDefaultName(config)
+
+        if compiledTerms is not None:
+            logger.info("Schedule and config are unchanged, using the compiled schedule")
+            tasks: list[tuple[Term, dict]] = [(compiledTerm.term, config) for compiledTerm in compiledTerms]
+        else:
+            with profiler.span("loadJSON"):
+                schedule: dict[dict] = loadJSON(config["schedulePath"])
+
+            # parse schedule file into objects
+            tasks: list[tuple[Term, dict]] = [(term, config) for term in parseSchedule(schedule)]
+            if artifactCache is not None:
+                compiledTerms = [compileTerm(term, config) for term, _ in tasks]
+
+    print("\n")
+
+    def isUpToDate(i: int) -> bool:
+        # the ICS files generated from an unchanged compiled schedule are kept as they are
+        if compiledTerms is None:
+            return False
+        try:
+            return compiledTerms[i].isGenerated(getOutputPath(tasks[i][1], tasks[i][0]))
+        except ValueError:  # an invalid name, it is reported by the generation
+            return False
+
+    pending: list[int] = [i for i in range(len(tasks)) if not isUpToDate(i)]  # in order, for generateTerms()
+    pendingSet: set[int] = set(pending)
+    dtstamp: datetime = datetime.now()  # shared by all events of this run
+    with tqdm(total=len(tasks), desc="Total: ") as progressbar:
+        for i, (term, termConfig) in enumerate(tasks):
+            if i not in pendingSet:
+                fileName: str = f"{termConfig["name"]} - {term.name}.ics"
+                logger.success(f"[{i + 1} of {len(tasks)}] ICS file is up to date - {fileName}")
+                progressbar.update(1)
+        tables: list[OccurrenceTable] | None = (
+            [compiledTerms[i].table for i in pending] if compiledTerms is not None else None
+        )
+        for j, error in generateTerms([tasks[i] for i in pending], dtstamp, cliArgs.jobs, tables):
+            i: int = pending[j]
+            term, termConfig = tasks[i]
+            fileName: str = f"{termConfig["name"]} - {term.name}.ics"
+            if error is not None:
+                logger.error(
+                    f"[{i + 1} of {len(tasks)}] Failed to generate ICS file - {fileName}: {type(error).__name__}: {error}"
+                )
+            else:
+                logger.success(f"[{i + 1} of {len(tasks)}] Successfully generated ICS file - {fileName}")
+            if compiledTerms is not None:
+                digest: str | None = getFileDigest(getOutputPath(termConfig, term)) if error is None else None
+                compiledTerms[i] = compiledTerms[i]._replace(digest=digest)
+            progressbar.update(1)
+
+    if artifactCache is not None and pending:
+        artifactCache.save(artifactKey, compiledTerms)
+
+    print("\n")
+    if cliArgs.profile:
+        profiler.dumpSpans(
+            Path(cliArgs.profile).resolve(),
+            version=VERSION,
+            jobs=cliArgs.jobs,
+            terms=len(tasks),
+            wallTime=time.perf_counter() - runStart,
+        )
+    logger.info("To import the ICS file, drag the generated ICS file into your calendar app")
+
 
-print("\n")
-logger.info("To import the ICS file, drag the generated ICS file into your calendar app")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+from __future__ import annotations
+
+from array import array
+from datetime import date
+from typing import TYPE_CHECKING
+
+import numpy as np
+from loguru import logger
+
+if TYPE_CHECKING:
+    from data import Course, Term
+
+
+def getSchoolDays(term: Term, countDayInHoliday: bool = False) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized Term.getSchoolDays(), the whole term is computed in one pass
+
+    Args:
+        term(Term): the term to compute
+        countDayInHoliday(bool): whether the workdays in holidays are counted by the day counter
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: the non-holiday workdays (datetime64[D]) and their day counters
+    """
+    start: np.datetime64 = np.datetime64(term.start.date(), "D")
+    end: np.datetime64 = np.datetime64(term.end.date(), "D") + np.timedelta64(1, "D")
+    dates: np.ndarray = np.arange(start, end, dtype="datetime64[D]")
+    holidays: np.ndarray = np.array(
+        [date.date() for date in term.getHolidayDates(term.start, term.end)], dtype="datetime64[D]"
+    )
+    schoolDays: np.ndarray = dates[np.is_busday(dates, holidays=holidays)]
+    # the day counter is the number of counted workdays before the date
+    counters: np.ndarray = np.busday_count(start, schoolDays, holidays=[] if countDayInHoliday else holidays)
+    return schoolDays, counters
+
+
+EPOCH_ORDINAL: int = date(1970, 1, 1).toordinal()  # datetime64[D] counts the days since 1970-01-01
+
+
+def expandOccurrences(term: Term, countDayInHoliday: bool = False) -> list[tuple[Course, array, array]]:
+    """
+    Vectorized occurrence expansion of the Date Range Strategy, compensation days are not included
+
+    Args:
+        term(Term): the term to expand
+        countDayInHoliday(bool): whether the workdays in holidays are counted by the day counter
+
+    Returns:
+        list[tuple[Course, array, array]]: every course with the day ordinals (typecode "i") and blocks (typecode "h")
+        of its occurrences, in the same order as the Date Range Strategy (by date, then by decoded index)
+    """
+    schoolDays, counters = getSchoolDays(term, countDayInHoliday)
+    ordinals: np.ndarray = schoolDays.astype(np.int64) + EPOCH_ORDINAL
+    logger.debug(f"{len(schoolDays)} school days are expanded by numpy engine")
+
+    expanded: list[tuple[Course, array, array]] = []
+    cycleDays: dict[int, np.ndarray] = {}  # courses with the same cycle share the cycle-day array
+    for course in term.courses:
+        if course.getCycleDay() not in cycleDays:
+            cycleDays[course.getCycleDay()] = counters % course.getCycleDay() + 1
+        cycleDay: np.ndarray = cycleDays[course.getCycleDay()]
+
+        timetable: np.ndarray = np.array(course.getDecodedIndex(term), dtype=np.int64).reshape(-1, 2)
+        # indices of the matching (school day, timestamp) pairs, ordered by school day then by timestamp
+        dayIndices, timestampIndices = np.nonzero(cycleDay[:, np.newaxis] == timetable[:, 0])
+        expanded.append(
+            (
+                course,
+                array("i", ordinals[dayIndices].astype(np.intc).tobytes()),
+                array("h", timetable[timestampIndices, 1].astype(np.short).tobytes()),
+            )
+        )
+    return expanded
+
+
+if __name__ == "__main__":
+    logger.warning("This module cannot run independently")
@@ -1,27 +1,72 @@
 #!/usr/bin/env python3
 # coding=utf-8
 
-import itertools
+import hashlib
 import locale
-import re
+from types import MappingProxyType
+from typing import NamedTuple
 
-from bs4 import BeautifulSoup, ResultSet, SoupStrainer, Tag
 from loguru import logger
 from tqdm import tqdm
-from requestHandler import RequestHandler
+from indexParser import ps2list
+from powerschoolParser import (
+    Cell,
+    HeaderCell,
+    HomePage,
+    ScheduleCell,
+    parseHomePage,
+    parseHomePageSoup,
+    parseSchedulePage,
+    parseSchedulePageSoup,
+)
+from requestHandler import RequestHandler, RequestHTTPError
+from responseCache import ResponseCache
+from sessionStore import SessionStore
 from utils import requestValue
 
 
+class GradeRow(NamedTuple):
+    """
+    A row of the grade table, the cells are looked up by the keys of the column map
+    (TimeIndex, Term1..N, Absent, Tardy)
+    """
+
+    name: str
+    location: str
+    teacher: str
+    cells: MappingProxyType  # column map key -> stripped cell text
+
+
 class PowerSchool:
     username: str
     password: str
 
-    def __init__(self, username: str, password: str, htmlParser: str = "lxml", mode="request") -> None:
+    BASE_URL = "https://nanjing.powerschool.com"
+    LOGIN_PATH = "/guardian/home.html"
+    SCHEDULE_PATH = "/guardian/myschedule.html"
+    HEADERS = {
+        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36",
+    }
+
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        htmlParser: str = "lxml",
+        mode="request",
+        cache: ResponseCache | None = None,
+        backend: str = "xpath",
+        sessionStore: SessionStore | None = None,
+    ) -> None:
         self.htmlParser: str = htmlParser
+        self.backend: str = backend  # "xpath" (lxml) or "bs4" (BeautifulSoup with htmlParser)
         self.mode: str = mode
-        self.__homePageContent: BeautifulSoup | None = None  # init
-        self.__schedulePageContent: BeautifulSoup | None = None  # init
+        self.cache: ResponseCache | None = cache  # pages are reused from the cache without logging in
+        self.sessionStore: SessionStore | None = sessionStore  # saved cookies are tried before logging in
+        self.__homePageContent: HomePage | None = None  # init
+        self.__schedulePageContent: tuple[ScheduleCell, ...] | None = None  # init
         self.__gradeTableColumnMap = None  # init
+        self.__gradeRows: tuple[GradeRow, ...] | None = None  # init
         try:
             self.__login(username, password)
         except Exception as e:
@@ -33,20 +78,17 @@ class PowerSchool:
             self.__gradeTableColumnMap = self.__getGradeTableColumnMap(self.__getGradeTableHeader())
 
     def __login(self, username: str, password: str):
-
-        def loginChecker() -> bool:
-            if "pslogin" in self.__homePageContent.body["class"] and self.__homePageContent.body["id"] == "pslogin":
-                # if a login user interface is detected
-                raise PowerschoolInvalidLoginInformation(
-                    "Failed to login to PowerSchool: Incorrect username or password"
-                )
-            elif "access has been disabled" in self.__homePageContent.select("#content-main h1")[0].text:
-                # if access is denied by PowerSchool (Grade table is not available)
-                raise PowerschoolExamRestriction(
-                    f"Access to PowerSchool is denied, {self.__homePageContent.select("#content-main h1")[0].text}"
-                )
-            else:
-                return True
+        loginUrl: str = self.BASE_URL + self.LOGIN_PATH
+        scheduleUrl: str = self.BASE_URL + self.SCHEDULE_PATH
+        # the cached pages and the saved session are only found with the right password
+        account: str = self.getAccountKey(username, password)
+        if self.cache is not None:
+            cachedHomePage: bytes | None = self.cache.get(account, loginUrl)
+            cachedSchedulePage: bytes | None = self.cache.get(account, scheduleUrl)
+            if cachedHomePage is not None and cachedSchedulePage is not None:
+                self.__loadPages(cachedHomePage, cachedSchedulePage)
+                logger.success("Using cached PowerSchool pages, login is skipped")
+                return
 
         progressbar = tqdm(
             desc="Logging into Powerschool",
@@ -55,22 +97,74 @@ class PowerSchool:
             bar_format="{l_bar}{bar}| {elapsed}",
             ncols=100,
         )
+        requester = RequestHandler(timeout=10, retry=3, headers=self.HEADERS)
+        progressbar.update(10)
+        logger.info("Connecting to Powerschool...")
+        psPage = None
+        if self.sessionStore is not None and self.sessionStore.load(account, requester.session.cookies):
+            # a single GET of home.html validates the saved session and fetches the page the login would return
+            try:
+                psPage = requester.get(loginUrl)
+                self.__loadHomePage(psPage.content)
+            except (PowerschoolInvalidLoginInformation, RequestHTTPError) as e:
+                # a stale session may be answered with the login page as well as with 401/403
+                logger.info(f"Saved PowerSchool session is stale ({type(e).__name__}), logging in again")
+                self.sessionStore.invalidate(account)
+                requester.session.cookies.clear()
+                psPage = None
+            else:
+                logger.info("Saved PowerSchool session is reused, login is skipped")
+        if psPage is None:
+            psPage = requester.post(loginUrl, data=self.getLoginData(username, password))
+            self.__loadHomePage(psPage.content)
+
+        progressbar.update(30)
+        schedulePage = requester.get(scheduleUrl)
+        progressbar.update(30)
+        self.__loadSchedulePage(schedulePage.content)
+        if self.sessionStore is not None:
+            self.sessionStore.save(account, requester.session.cookies)
+        if self.cache is not None:  # only the pages of a successful login are cached
+            self.cache.put(account, loginUrl, psPage.content)
+            self.cache.put(account, scheduleUrl, schedulePage.content)
+        progressbar.update(30)
+        logger.success("Successfully login to PowerSchool")
+
+    @staticmethod
+    def getAccountKey(username: str, password: str) -> str:
+        """
+        Identify an account by its credentials, for the caches of the account
+
+        A page cached with the right password is not returned for a wrong one.
+        The password is stretched with PBKDF2, so it cannot be cheaply guessed from the cache file names.
+
+        Args:
+            username(str): the username of PowerSchool
+            password(str): the password of PowerSchool
+
+        Returns:
+            str: the hex key of the account
+        """
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), f"ischedule\x00{username}".encode(), 100_000).hex()
+
+    @staticmethod
+    def getLoginData(username: str, password: str) -> dict[str, str]:
+        """
+        Build the form of the login request
+
+        Args:
+            username(str): the username of PowerSchool
+            password(str): the password of PowerSchool
+
+        Returns:
+            dict[str, str]: the form data, in the language of the system (English if it is unsupported)
+        """
         languageSetting = locale.getlocale()[0]
         logger.debug(f"System language: {languageSetting}")
         if languageSetting != "zh_CN" and languageSetting != "en_US":
             logger.warning("Default system language is unsupported, using English as default...")
             languageSetting = "en_US"
-
-        requester = RequestHandler(
-            timeout=10,
-            retry=3,
-            headers={
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36",
-            },
-        )
-        LOGIN_URL = "https://nanjing.powerschool.com/guardian/home.html"
-        SCHEDULE_URL = "https://nanjing.powerschool.com/guardian/myschedule.html"
-        PSLOGINDATA = {
+        return {
             "dbpw": password,
             "serviceName": "PS Parent Portal",
             "pcasServerUrl": "/",
@@ -79,129 +173,123 @@ class PowerSchool:
             "account": username,
             "pw": password,
         }
-        progressbar.update(10)
-        logger.info("Connecting to Powerschool...")
-        psPage = requester.post(LOGIN_URL, data=PSLOGINDATA)
 
-        progressbar.update(30)
-        schedulePage = requester.get(SCHEDULE_URL)
-        progressbar.update(30)
-        schedulePageFilter = SoupStrainer(
-            ["tr", "td", "th", "table", "tbody", "br"]
-        )  # optimization, get rid of uncessary tags
-        self.__schedulePageContent = BeautifulSoup(schedulePage.content, self.htmlParser, parse_only=schedulePageFilter)
-        progressbar.update(30)
+    def __loadPages(self, homePage: bytes, schedulePage: bytes) -> None:
+        self.__loadHomePage(homePage)
+        self.__loadSchedulePage(schedulePage)
+
+    def __loadHomePage(self, homePage: bytes) -> None:
+
+        def loginChecker() -> bool:
+            if "pslogin" in self.__homePageContent.bodyClasses and self.__homePageContent.bodyId == "pslogin":
+                # if a login user interface is detected
+                raise PowerschoolInvalidLoginInformation(
+                    "Failed to login to PowerSchool: Incorrect username or password"
+                )
+            elif "access has been disabled" in self.__homePageContent.heading:
+                # if access is denied by PowerSchool (Grade table is not available)
+                raise PowerschoolExamRestriction(f"Access to PowerSchool is denied, {self.__homePageContent.heading}")
+            else:
+                return True
 
-        self.__homePageContent = BeautifulSoup(psPage.content, self.htmlParser)
+        # the pages are parsed once, only the login markers, the grade table and the schedule matrix are kept
+        self.__gradeRows = None  # built from the new page on first access
+        self.__gradeRowIndex: dict[str, tuple[GradeRow, ...]] = {}
+        if self.backend == "bs4":
+            self.__homePageContent = parseHomePageSoup(homePage, self.htmlParser)
+        elif self.backend == "xpath":
+            self.__homePageContent = parseHomePage(homePage)
+        else:
+            raise ValueError(f'Invalid parsing backend "{self.backend}", it should be "xpath" or "bs4"')
 
         try:
             loginChecker()
         except Exception as e:
             raise e
-        else:
-            logger.success("Successfully login to PowerSchool")
 
-    @staticmethod
-    def ps2list(psIndex: str | list, cycle: int) -> list[list]:
-        def componentParser(component: str) -> list:
-            # pre-processing
-            abbrDict = {
-                "odd": [i for i in range(1, cycle + 1, 2)],  # List of odd days
-                "even": [i for i in range(2, cycle + 1, 2)],  # List of even days
-                "everyday": [i for i in range(1, cycle + 1)],  # List of all days
-            }
-            component = component.strip()  # trim the leading and trailing whitespace
-
-            dashIndex: int = component.find("-")  # if the component is a range
-            if dashIndex != -1:  # is range
-                # filling the range
-                leftBound, rightBound = int(component[:dashIndex]), int(component[dashIndex + 1 :])
-                if leftBound > rightBound:
-                    raise ValueError(
-                        f'Invalid schedule file, Error processing "{psIndex}", "{leftBound}-{rightBound}" is out of range'
-                    )
-                return [i for i in range(leftBound, rightBound + 1)]
-
-            else:  # not range
-                if component.isdigit():
-                    return [int(component)]
-                elif component in abbrDict:
-                    return abbrDict[component]
-                else:
-                    raise ValueError(f'Invalid Powerschool index format, cannot parse component "{component}"')
-
-        psIndexes: list = []
-        if isinstance(psIndex, str):
-            psIndexes = [psIndex]
+    def __loadSchedulePage(self, schedulePage: bytes) -> None:
+        if self.backend == "bs4":
+            self.__schedulePageContent = parseSchedulePageSoup(schedulePage, self.htmlParser)
+        elif self.backend == "xpath":
+            self.__schedulePageContent = parseSchedulePage(schedulePage)
         else:
-            psIndexes = psIndex
-
-        parsedIndex: list = []
-        for psIndex in psIndexes:
-            psIndex = psIndex.strip().lower()  # trim the trailing and leading spaces
-            leftParentheseIndex: int = psIndex.find("(")
-            rightParentheseIndex: int = psIndex.rfind(")")
-            if leftParentheseIndex == -1 or rightParentheseIndex == -1:
-                # can not find parentheses
-                raise ValueError("Invalid Powerschool index format, cannot find parentheses")
-
-            if psIndex.startswith("p"):
-                psIndex = psIndex.removeprefix("p")
-            elif psIndex.startswith("hr"):
-                raise ValueError(
-                    'PS index starts with "hr", do you mean "Homeroom"? It isn\'t currently supported by PS Connector'
+            raise ValueError(f'Invalid parsing backend "{self.backend}", it should be "xpath" or "bs4"')
+
+    @classmethod
+    def fromPages(
+        cls, homePage: bytes, schedulePage: bytes, htmlParser: str = "lxml", backend: str = "xpath"
+    ) -> "PowerSchool":
+        """
+        Build a PowerSchool instance from saved pages, without any network request
+
+        Args:
+            homePage(bytes): the content of home.html after login
+            schedulePage(bytes): the content of myschedule.html
+            htmlParser(str): the parser used by BeautifulSoup
+            backend(str): "xpath" (lxml) or "bs4" (BeautifulSoup with htmlParser)
+
+        Returns:
+            PowerSchool: the instance, as if it was logged in
+        """
+        powerschool: PowerSchool = cls.__new__(cls)
+        powerschool.htmlParser = htmlParser
+        powerschool.backend = backend
+        powerschool.mode = "offline"
+        powerschool.__loadPages(homePage, schedulePage)
+        powerschool.__gradeTableColumnMap = powerschool.__getGradeTableColumnMap(powerschool.__getGradeTableHeader())
+        return powerschool
+
+    ps2list = staticmethod(ps2list)  # kept for compatibility, the parser lives in indexParser
+
+    def __getGradeTableHeader(self) -> tuple[HeaderCell, ...]:
+        if not self.__homePageContent.header:
+            raise RuntimeError("Cannot find the grade table in the home page")
+        return self.__homePageContent.header
+
+    def __getGradeTableContent(self) -> tuple[tuple[Cell, ...], ...]:
+        return self.__homePageContent.rows
+
+    def __getGradeRows(self) -> tuple[GradeRow, ...]:
+        """
+        Parse the grade table into immutable rows, it is done once per page load
+
+        Returns:
+            tuple[GradeRow, ...]: the rows in table order, they are also indexed by course name
+        """
+        if self.__gradeRows is None:
+            columnMap = self.__gradeTableColumnMap
+            rows: list[GradeRow] = []
+            index: dict[str, list[GradeRow]] = {}
+            for tRow in self.__getGradeTableContent():
+                courseInformation: dict = self.__getCourseInformation(tRow[columnMap["CourseInformation"]])
+                courseName = list(courseInformation.keys())[0]
+                cells = MappingProxyType(
+                    {key: tRow[column].text.strip() for key, column in columnMap.items() if column < len(tRow)}
                 )
-            else:
-                raise ValueError("Invalid Powerschool index format, it should startwith 'P'")
-
-            if len(psIndex[: leftParentheseIndex - 1]) != 0:
-                block: int = int(psIndex[: leftParentheseIndex - 1])
-            else:
-                block = -1
-
-            if block < 0:
-                raise ValueError("Invalid Powerschool index format, block number is invalid or out of range")
-            indexes: str = psIndex[leftParentheseIndex : rightParentheseIndex - 1]
-
-            components: list[str] = indexes.split(",")
-            parsedComponent: list[list] = []
-            for component in components:
-                parsedComponent.extend([list(t) for t in itertools.product(componentParser(component), [block - 1])])
-
-            parsedIndex.extend(parsedComponent)
-
-        print(parsedIndex)
-        return parsedIndex
-
-    def __getGradeTable(self) -> Tag:
-        return self.__homePageContent.select_one("table.linkDescList.grid")
-
-    def __getGradeTableHeader(self) -> ResultSet[Tag]:
-        return (
-            self.__getGradeTable()
-            .find_all(
-                lambda tag: tag.get("class") == ["center", "th2"] and tag.get("id", "") == "",
-                recursive=False,
-            )[0]
-            .select("th")
-        )
-
-    def __getGradeTableContent(self) -> ResultSet[Tag]:
-        return self.__getGradeTable().find_all(
-            lambda tag: tag.get("class") == ["center"] and tag.get("id", "").startswith("ccid"),
-            recursive=False,
-        )
-
-    def __getGradeTableColumnMap(self, gradeTableHeader: ResultSet[Tag]) -> dict[str, int]:
+                courseData: dict = courseInformation[courseName]
+                row = GradeRow(courseName, courseData["location"], courseData["teacher"], cells)
+                rows.append(row)
+                index.setdefault(courseName, []).append(row)
+            self.__gradeRows = tuple(rows)
+            self.__gradeRowIndex = {courseName: tuple(courseRows) for courseName, courseRows in index.items()}
+        return self.__gradeRows
+
+    def __getGradeRowsOf(self, course: str) -> tuple[GradeRow, ...]:
+        self.__getGradeRows()
+        if course not in self.__gradeRowIndex:
+            raise KeyError(f'Course "{course}" is not found in the grade table')
+        return self.__gradeRowIndex[course]
+
+    def __getGradeTableColumnMap(self, gradeTableHeader: tuple[HeaderCell, ...]) -> dict[str, int]:
         colCnt = 0
         colMap: dict = {}
         logger.debug("Building column map...")
         for item in gradeTableHeader:
             # rowspan+1, colspan+5
-            rowSpan = item.get("rowspan", False)
-            colSpan = item.get("colspan", False)
+            rowSpan = item.rowSpan
+            colSpan = item.colSpan
 
-            content: str = item.get_text().strip()
+            content: str = item.text.strip()
             if content == "开课时间" or content == "Exp":
                 logger.debug(f'Found "{content}" in col {colCnt}')
                 colMap["TimeIndex"] = colCnt
@@ -232,12 +320,12 @@ class PowerSchool:
         logger.debug(f"Column map is built: {colMap}")
         return colMap
 
-    def __getCourseInformation(self, tCell: Tag) -> dict[str, str]:
-        tData = [item for item in tCell.get_text().split("\xa0") if item != "\xa0"]
+    def __getCourseInformation(self, tCell: Cell) -> dict[str, str]:
+        tData = [item for item in tCell.text.split("\xa0") if item != "\xa0"]
         # /xa0 represents the &nbsp; in HTML
         courseName: str = tData[0].strip()
-        courseLocation: str = tCell.find("span", text="-\xa0Rm:").find_next_sibling("span").get_text(strip=True)
-        courseTeacher: str = tCell.find("a", {"target": "_top"}).get_text().removeprefix("Email").strip()
+        courseLocation: str | None = tCell.location
+        courseTeacher: str | None = tCell.teacher.removeprefix("Email").strip() if tCell.teacher is not None else None
         if courseName and courseLocation and courseTeacher:
             courseLocation.replace("，", ", ")  # TODO: work around: this doesn't work
             # replace chinese comma with English comma
@@ -249,18 +337,15 @@ class PowerSchool:
             raise RuntimeError("Unexpected error occur while finding course information")
 
     def getAllCourseInformation(self) -> dict[any, dict]:
-        gradeTableContent = self.__getGradeTableContent()  # list of table content
-        columnMap = self.__gradeTableColumnMap
-
         course: dict = {}
-        for tRow in gradeTableContent:
-            tData = tRow.select("td")
-            courseInformation: dict = self.__getCourseInformation(tData[columnMap["CourseInformation"]])
-            courseName = list(courseInformation.keys())[0]
+        for row in self.__getGradeRows():
+            courseName = row.name
             if courseName == "BCA Homeroom":  # ignore BCA Homeroom
                 logger.warning(f'Skip "{courseName}" while parsing course information')
                 continue
-            courseInformation[courseName]["index"] = [tData[columnMap["TimeIndex"]].get_text().strip()]
+            courseInformation: dict = {
+                courseName: {"location": row.location, "teacher": row.teacher, "index": [row.cells["TimeIndex"]]}
+            }
 
             if course.get(courseName) is not None:  # if there is duplicate course with different information, merge it
                 logger.debug(f"Duplicate course name: {courseName}, trying to merge content")
@@ -300,19 +385,15 @@ class PowerSchool:
             else:
                 raise ValueError(f'Unexpected invalid timestamp: "{timestamp}"')
 
-        scheduleTbody: Tag = self.__schedulePageContent.select_one("#tableStudentSchedMatrix")
-        matrixItemsFilter = re.compile(r"scheduleClass\d+")
-
         matrixItems = set()
-        for item in scheduleTbody.find_all("td", class_=matrixItemsFilter):
-            content: list = item.contents
-            courseName: str = content[0].strip()
+        for item in self.__schedulePageContent:
+            courseName: str = item.first.strip()
             if courseName == "BCA Homeroom":
                 logger.debug(f"Skip {courseName} while parsing timestamp")
                 # skipped
                 continue
 
-            matrixItems.add(item.contents[-1])
+            matrixItems.add(item.last)
         matrixItems = sorted([timeParser(item) for item in list(matrixItems)])
         logger.debug(f'Timetable parsed, result: "{matrixItems}"')
         return matrixItems
@@ -320,7 +401,6 @@ class PowerSchool:
     def getScheduleJsonContent(
         self,
     ) -> dict[any, dict]:
-        scheduleJson: dict = {}
         logger.info("PS Connect would ask you for required information")
         logger.info("For example: (Default Value) XXX Info: Your Input")
         logger.info("Press ENTER for using default setting")
@@ -331,7 +411,25 @@ class PowerSchool:
 
         duration: int = requestValue("Duration for each class", int, defaultValue=70, unit="minutes")
         cycle: int = requestValue("How many weeks per cycle", int, defaultValue=2, unit="week")
+        return self.buildScheduleJson(termName, termStart, termEnd, duration, cycle)
 
+    def buildScheduleJson(
+        self, termName: str, termStart: list[int], termEnd: list[int], duration: int = 70, cycle: int = 2
+    ) -> dict[any, dict]:
+        """
+        Build the content of schedule.json without asking the user
+
+        Args:
+            termName(str): the name of the term
+            termStart(list[int]): the first day of the term, [year, month, day]
+            termEnd(list[int]): the last day of the term, [year, month, day]
+            duration(int): the duration of each class in minutes
+            cycle(int): the number of weeks per cycle
+
+        Returns:
+            dict[any, dict]: the schedule with the timetable and courses of PowerSchool
+        """
+        scheduleJson: dict = {}
         # input validation checking
         if len(termStart) != 3 or len(termEnd) != 3:
             raise ValueError("Invalid date value")
@@ -356,17 +454,39 @@ class PowerSchool:
 
         return scheduleJson
 
-    def getGrade(self, time: str, course: str):
-        columnMap = self.__gradeTableColumnMap
-        gradeTableContent = self.__getGradeTableContent()
-
-        for index, tRow in enumerate(gradeTableContent):
-            tData = tRow.select("td")
-            courseInformation: dict = self.__getCourseInformation(tData[columnMap["CourseInformation"]])
-            courseName = list(courseInformation.keys())[0]
-            if courseName == course:
-                raise NotImplementedError("getGrade is not implemented yet")
-                return tData[columnMap[time.upper()]].get_text().strip()  # TODO: this return need implementation
+    def getGrade(self, time: str, course: str) -> str:
+        """
+        Get the grade of a course in a term
+
+        Args:
+            time(str): the term, e.g. "T1", "S2" or "Term1"
+            course(str): the name of the course
+
+        Returns:
+            str: the grade shown in the grade table, empty if there is no grade yet
+        """
+        key: str = f"Term{time[-1]}" if time[:1].upper() in ("T", "S") and time[-1:].isdigit() else time
+        if key not in self.__gradeTableColumnMap:
+            raise KeyError(f'Term "{time}" is not found in the grade table')
+        # a course with several sections has a row for each of them, the first one is used
+        return self.__getGradeRowsOf(course)[0].cells[key]
+
+    def getAttendance(self, course: str) -> dict[str, int]:
+        """
+        Get the attendance of a course
+
+        Args:
+            course(str): the name of the course
+
+        Returns:
+            dict[str, int]: the number of "Absent" and "Tardy", summed over the sections of the course
+        """
+        attendance: dict[str, int] = {"Absent": 0, "Tardy": 0}
+        for row in self.__getGradeRowsOf(course):
+            for key in attendance:
+                value: str = row.cells.get(key, "")
+                attendance[key] += int(value) if value.isdigit() else 0
+        return attendance
 
 
 if __name__ == "__main__":
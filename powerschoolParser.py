@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# coding=utf-8
+import re
+from typing import NamedTuple
+
+from loguru import logger
+from lxml import etree, html
+
+SCHEDULE_CLASS_PATTERN = re.compile(r"scheduleClass\d+")
+LOCATION_LABEL = "-\xa0Rm:"  # the label before the location of a course, \xa0 represents the &nbsp; in HTML
+
+
+def hasClass(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+ENCODING = "utf-8"  # PowerSchool serves UTF-8, lxml would fall back to latin-1 without a charset declaration
+
+# compiled once, the same queries as the CSS selectors and filters of the BeautifulSoup backend
+BODY_XPATH = etree.XPath("//body")
+HEADING_XPATH = etree.XPath("//*[@id='content-main']//h1")
+GRADE_TABLE_XPATH = etree.XPath(f"//table[{hasClass('linkDescList')}][{hasClass('grid')}]")
+HEADER_ROW_XPATH = etree.XPath("tr[normalize-space(@class)='center th2'][not(@id) or @id='']")
+CONTENT_ROW_XPATH = etree.XPath("tr[normalize-space(@class)='center'][starts-with(@id, 'ccid')]")
+LOCATION_XPATH = etree.XPath(".//span[.=$label]/following-sibling::span[1]")
+TEACHER_XPATH = etree.XPath(".//a[@target='_top']")
+SCHEDULE_CELL_XPATH = etree.XPath("//*[@id='tableStudentSchedMatrix']//td[contains(@class, 'scheduleClass')]")
+
+
+class HeaderCell(NamedTuple):
+    text: str
+    rowSpan: str | None  # the raw attributes, a header cell spans 1 column with rowspan and 5 with colspan
+    colSpan: str | None
+
+
+class Cell(NamedTuple):
+    text: str
+    location: str | None  # only found in the course information cell
+    teacher: str | None
+
+
+class ScheduleCell(NamedTuple):
+    first: str  # the first text of the cell, the course name
+    last: str  # the last text of the cell, the time of the course
+
+
+class HomePage(NamedTuple):
+    bodyClasses: tuple[str, ...]
+    bodyId: str
+    heading: str  # the text of the first "#content-main h1"
+    header: tuple[HeaderCell, ...]  # empty if the grade table is not found
+    rows: tuple[tuple[Cell, ...], ...]
+
+
+def parseHomePage(content: bytes) -> HomePage:
+    """
+    Extract the login markers and the grade table of home.html with lxml XPath, in a single parse
+
+    Args:
+        content(bytes): the content of home.html
+
+    Returns:
+        HomePage: the extracted page
+    """
+    root = html.fromstring(content, parser=html.HTMLParser(encoding=ENCODING))
+    bodies = BODY_XPATH(root)
+    body = bodies[0] if bodies else None
+    headings = HEADING_XPATH(root)
+    header: tuple[HeaderCell, ...] = ()
+    rows: tuple[tuple[Cell, ...], ...] = ()
+
+    gradeTables = GRADE_TABLE_XPATH(root)
+    if gradeTables:
+        headerRows = HEADER_ROW_XPATH(gradeTables[0])
+        if headerRows:
+            header = tuple(
+                HeaderCell(th.text_content(), th.get("rowspan"), th.get("colspan")) for th in headerRows[0].iter("th")
+            )
+
+        def getCell(td: html.HtmlElement) -> Cell:
+            locations = LOCATION_XPATH(td, label=LOCATION_LABEL)
+            teachers = TEACHER_XPATH(td)
+            return Cell(
+                td.text_content(),
+                locations[0].text_content().strip() if locations else None,
+                teachers[0].text_content() if teachers else None,
+            )
+
+        rows = tuple(tuple(getCell(td) for td in tr.iter("td")) for tr in CONTENT_ROW_XPATH(gradeTables[0]))
+
+    return HomePage(
+        bodyClasses=tuple(body.get("class", "").split()) if body is not None else (),
+        bodyId=body.get("id", "") if body is not None else "",
+        heading=headings[0].text_content() if headings else "",
+        header=header,
+        rows=rows,
+    )
+
+
+def parseSchedulePage(content: bytes) -> tuple[ScheduleCell, ...]:
+    """
+    Extract the cells of #tableStudentSchedMatrix in myschedule.html with lxml XPath
+
+    Args:
+        content(bytes): the content of myschedule.html
+
+    Returns:
+        tuple[ScheduleCell, ...]: the first and last text of every course cell
+    """
+    cells: list[ScheduleCell] = []
+    for td in SCHEDULE_CELL_XPATH(html.fromstring(content, parser=html.HTMLParser(encoding=ENCODING))):
+        if not any(SCHEDULE_CLASS_PATTERN.search(name) for name in td.get("class", "").split()):
+            continue
+        children = list(td)
+        cells.append(ScheduleCell(td.text or "", (children[-1].tail or "") if children else (td.text or "")))
+    return tuple(cells)
+
+
+def parseHomePageSoup(content: bytes, htmlParser: str = "lxml") -> HomePage:
+    """
+    BeautifulSoup version of parseHomePage(), the output is the same
+
+    Args:
+        content(bytes): the content of home.html
+        htmlParser(str): the parser used by BeautifulSoup
+
+    Returns:
+        HomePage: the extracted page
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, htmlParser)
+    headings = soup.select("#content-main h1")
+    header: tuple[HeaderCell, ...] = ()
+    rows: tuple[tuple[Cell, ...], ...] = ()
+
+    gradeTable = soup.select_one("table.linkDescList.grid")
+    if gradeTable is not None:
+        headerRows = gradeTable.find_all(
+            lambda tag: tag.get("class") == ["center", "th2"] and tag.get("id", "") == "", recursive=False
+        )
+        if headerRows:
+            header = tuple(
+                HeaderCell(th.get_text(), th.get("rowspan"), th.get("colspan")) for th in headerRows[0].select("th")
+            )
+
+        def getLocation(td) -> str | None:
+            label = td.find("span", string=LOCATION_LABEL)
+            location = label.find_next_sibling("span") if label is not None else None
+            return location.get_text(strip=True) if location is not None else None
+
+        rows = tuple(
+            tuple(
+                Cell(
+                    td.get_text(),
+                    getLocation(td),
+                    td.find("a", {"target": "_top"}).get_text() if td.find("a", {"target": "_top"}) else None,
+                )
+                for td in tr.select("td")
+            )
+            for tr in gradeTable.find_all(
+                lambda tag: tag.get("class") == ["center"] and tag.get("id", "").startswith("ccid"), recursive=False
+            )
+        )
+
+    return HomePage(
+        bodyClasses=tuple(soup.body.get("class", [])) if soup.body is not None else (),
+        bodyId=soup.body.get("id", "") if soup.body is not None else "",
+        heading=headings[0].text if headings else "",
+        header=header,
+        rows=rows,
+    )
+
+
+def parseSchedulePageSoup(content: bytes, htmlParser: str = "lxml") -> tuple[ScheduleCell, ...]:
+    """
+    BeautifulSoup version of parseSchedulePage(), the output is the same
+
+    Args:
+        content(bytes): the content of myschedule.html
+        htmlParser(str): the parser used by BeautifulSoup
+
+    Returns:
+        tuple[ScheduleCell, ...]: the first and last text of every course cell
+    """
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    # optimization, get rid of uncessary tags
+    soup = BeautifulSoup(content, htmlParser, parse_only=SoupStrainer(["tr", "td", "th", "table", "tbody", "br"]))
+    scheduleTable = soup.select_one("#tableStudentSchedMatrix")
+    if scheduleTable is None:
+        return ()
+    return tuple(
+        ScheduleCell(str(td.contents[0]), str(td.contents[-1]))
+        for td in scheduleTable.find_all("td", class_=SCHEDULE_CLASS_PATTERN)
+        if td.contents
+    )
+
+
+if __name__ == "__main__":
+    logger.warning("This module cannot run independently")
@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 # coding=utf-8
 
+import argparse
 import os
 import json
 import pwinput
 from powerschool import PowerSchool, PowerschoolExamRestriction, PowerschoolInvalidLoginInformation
+from requestHandler import RequestError
+from responseCache import CACHE_TTL, ResponseCache
+from sessionStore import SESSION_TTL, SessionStore
 from utils import *
 from pathlib import Path
 from dotenv import load_dotenv
@@ -19,6 +23,22 @@ logger.add(
     colorize=True,
 )
 logger.add("powerschool_connector.log", level="TRACE", rotation="100KB")
+
+cliArgumentParser = argparse.ArgumentParser(description="iSchedule PowerSchool Connector")
+cliArgumentParser.add_argument("--replay", type=str, help="离线解析已保存的页面: 包含home.html与myschedule.html的目录")
+cliArgumentParser.add_argument("--no-cache", action="store_true", help="不使用页面缓存, 重新登录PowerSchool")
+cliArgumentParser.add_argument("--cache-ttl", type=float, default=CACHE_TTL, help="页面缓存的有效时间(秒)")
+cliArgumentParser.add_argument("--no-session", action="store_true", help="不复用已保存的登录会话, 每次都重新登录")
+cliArgumentParser.add_argument("--session-ttl", type=float, default=SESSION_TTL, help="已保存登录会话的有效时间(秒)")
+cliArgumentParser.add_argument(
+    "--bulk",
+    type=str,
+    help='批量模式: JSON文件 {"term": {"name", "start", "end", "duration", "cycle"}, "accounts": [{"username", "password"}]}',
+)
+cliArgumentParser.add_argument("-o", "--output", type=str, default="schedules", help="批量模式的输出目录")
+cliArgumentParser.add_argument("-j", "--jobs", type=int, default=4, help="批量模式同时登录的账号数")
+cliArgumentParser.add_argument("--rate", type=float, default=2, help="批量模式每秒向PowerSchool发送的最大请求数")
+cliArgs = cliArgumentParser.parse_args()
 load_dotenv()
 psUsernameCache: str | None = os.getenv("PS_USERNAME")
 psPasswordCache: str | None = os.getenv("PS_PASSWORD")
@@ -42,9 +62,36 @@ def requestUserInformation(disableCache=False) -> list:
 
 
 logger.debug("PS Connector starting...")
+if cliArgs.bulk:
+    from asyncPowerschool import harvestSchedules
+
+    bulk: dict = loadJSON(Path(cliArgs.bulk))
+    outputPath = Path(cliArgs.output).resolve()
+    report: list[dict] = harvestSchedules(
+        bulk["accounts"], bulk.get("term", {}), outputPath, jobs=cliArgs.jobs, rate=cliArgs.rate
+    )
+    (outputPath / "report.json").write_text(json.dumps(report, ensure_ascii=False, indent=4), encoding="utf-8")
+    logger.info(f"Status of every account is written to {outputPath / 'report.json'}")
+    exit(0 if all(item["status"] == "ok" for item in report) else 4)
 MAX_ATTEMPTS = 3
 powerschool: PowerSchool
-for attempt in range(MAX_ATTEMPTS):
+responseCache: ResponseCache | None = None
+if not cliArgs.no_cache and not cliArgs.replay:
+    responseCache = ResponseCache(Path.cwd() / ".powerschool_cache", ttl=cliArgs.cache_ttl)
+sessionStore: SessionStore | None = None
+if not cliArgs.no_session and not cliArgs.replay:
+    sessionStore = SessionStore(Path.cwd() / ".powerschool_cache" / "sessions", ttl=cliArgs.session_ttl)
+if cliArgs.replay:
+    replayPath = Path(cliArgs.replay)
+    try:
+        powerschool = PowerSchool.fromPages(
+            (replayPath / "home.html").read_bytes(), (replayPath / "myschedule.html").read_bytes()
+        )
+    except Exception as e:
+        logger.critical(f"Failed to replay the pages in {replayPath}: {e}")
+        exit(2)
+    logger.success(f"Pages in {replayPath} are loaded, no request is sent to Powerschool")
+for attempt in range(0 if cliArgs.replay else MAX_ATTEMPTS):
     if attempt > 0:  # if it is not the first attempt, then notify the user
         logger.warning(
             f"Login Failed (Attempt:[{attempt+1}/{MAX_ATTEMPTS}]), retrying..."
@@ -54,10 +101,16 @@ for attempt in range(MAX_ATTEMPTS):
         disableCache = False
 
     try:
-        powerschool = PowerSchool(*requestUserInformation(disableCache))
+        powerschool = PowerSchool(
+            *requestUserInformation(disableCache), cache=responseCache, sessionStore=sessionStore
+        )
     except PowerschoolExamRestriction as e:
         logger.error(f"Failed to login to Powerschool because: {e}")
         logger.info("Please try again later during non-exam period, or please contact your school")
+    except RequestError as e:
+        # the requests are already retried by RequestHandler, the user information is not the problem
+        logger.error(f"Failed to connect to Powerschool because: {e}")
+        exit(1)
     except PowerschoolInvalidLoginInformation as e:
         logger.error(f"Failed to login to Powerschool because: {e}")
         if attempt == MAX_ATTEMPTS - 1:
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# coding=utf-8
+import json
+import time
+from pathlib import Path
+from functools import wraps
+from typing import Any, Callable, Generator, Iterable, TypeVar
+
+from loguru import logger
+
+T = TypeVar("T")
+
+_enabled: bool = False
+_spans: dict[str, dict[str, float | int]] = {}
+
+
+class Span:
+    """
+    Time a phase of the pipeline, the duration is added to the span with the same name
+
+    Args:
+        name(str): the name of the phase
+    """
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self.start: float = 0
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        record(self.name, time.perf_counter() - self.start)
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "NullSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+
+NULL_SPAN = NullSpan()  # returned when profiling is disabled, so that a disabled span costs a function call
+
+
+def enable(enabled: bool = True) -> None:
+    global _enabled
+    _enabled = enabled
+
+
+def isEnabled() -> bool:
+    return _enabled
+
+
+def span(name: str) -> Span | NullSpan:
+    """
+    Time a phase of the pipeline, e.g. "with span('parseSchedule'): ..."
+
+    Args:
+        name(str): the name of the phase
+
+    Returns:
+        Span | NullSpan: the context manager, it does nothing if profiling is disabled
+    """
+    return Span(name) if _enabled else NULL_SPAN
+
+
+def profiled(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """
+    Decorator version of span(), every call of the decorated function is timed
+
+    Args:
+        name(str): the name of the phase
+    """
+
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> T:
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record(name: str, duration: float, count: int = 1) -> None:
+    if not _enabled:
+        return
+    stats: dict[str, float | int] | None = _spans.get(name)
+    if stats is None:
+        _spans[name] = {"count": count, "total": duration, "max": duration}
+    else:
+        stats["count"] += count
+        stats["total"] += duration
+        stats["max"] = max(stats["max"], duration)
+
+
+def iterate(name: str, iterable: Iterable[T]) -> Generator[T, None, None]:
+    """
+    Time the production of every item of a lazy iterable, e.g. the occurrences of a term
+
+    Args:
+        name(str): the name of the phase
+        iterable(Iterable[T]): the iterable to time
+
+    Yields:
+        T: the items of the iterable
+    """
+    if not _enabled:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    while True:
+        start: float = time.perf_counter()
+        try:
+            item: T = next(iterator)
+        except StopIteration:
+            record(name, time.perf_counter() - start, count=0)
+            return
+        record(name, time.perf_counter() - start)
+        yield item
+
+
+def getSpans() -> dict[str, dict[str, float | int]]:
+    return {name: stats.copy() for name, stats in _spans.items()}
+
+
+def mergeSpans(spans: dict[str, dict[str, float | int]]) -> None:
+    """
+    Merge the spans recorded by another process, e.g. a worker of main.generateTerms()
+
+    Args:
+        spans(dict[str, dict[str, float | int]]): the spans returned by getSpans()
+    """
+    for name, stats in spans.items():
+        if name not in _spans:
+            _spans[name] = stats.copy()
+        else:
+            _spans[name]["count"] += stats["count"]
+            _spans[name]["total"] += stats["total"]
+            _spans[name]["max"] = max(_spans[name]["max"], stats["max"])
+
+
+def reset() -> None:
+    _spans.clear()
+
+
+def dumpSpans(path: Path, **metadata: Any) -> None:
+    """
+    Write the recorded spans as JSON
+
+    Args:
+        path(Path): the JSON file to write
+        **metadata: extra information of the run, e.g. the version and the number of jobs
+    """
+    report: dict[str, Any] = metadata | {
+        "spans": {
+            name: stats | {"mean": stats["total"] / stats["count"] if stats["count"] else 0}
+            for name, stats in sorted(_spans.items(), key=lambda item: item[1]["total"], reverse=True)
+        }
+    }
+    path.write_text(json.dumps(report, indent=4), encoding="utf-8")
+    logger.info(f"Profile is written to {path}")
+
+
+if __name__ == "__main__":
+    logger.warning("This module cannot run independently")
@@ -1,55 +1,168 @@
 #!/usr/bin/env python3
 # coding=utf-8
 
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
 import requests
 from loguru import logger
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}  # transient statuses, other HTTP errors are not retried
+REDACTED_KWARGS = {"data", "json", "params", "auth", "cookies", "headers"}  # never written to the logs
+
+
+class RateLimiter:
+    """
+    Thread-safe per-host rate limiter, the requests to a host are spaced by at least 1 / rate seconds
+
+    Args:
+        rate(float): the maximum number of requests per second to each host
+    """
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1 / rate
+        self.__nextSlots: dict[str, float] = {}
+        self.__lock = threading.Lock()
+
+    def acquire(self, url: str) -> None:
+        host: str = urlsplit(url).netloc
+        with self.__lock:  # reserve the next slot of the host, then wait for it outside of the lock
+            now: float = time.monotonic()
+            slot: float = max(now, self.__nextSlots.get(host, now))
+            self.__nextSlots[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
 
 class RequestHandler:
-    def __init__(self, timeout: int = 10, retry: int = 3, headers: dict = {}) -> None:
+    """
+    requests.Session with connection pooling, retries and typed errors
+
+    Failed requests are retried with exponential backoff and full jitter,
+    the delay of attempt n is a random value between 0 and min(maxBackoff, backoff * 2**n),
+    or the Retry-After of the response if it is given.
+
+    Args:
+        timeout(float): the timeout of an attempt in seconds
+        retry(int): the maximum number of attempts of a request
+        headers(dict): the headers of every request
+        poolSize(int): the maximum number of connections kept alive per host
+        keepAlive(bool): reuse the connections between requests
+        backoff(float): the base delay of the backoff in seconds
+        maxBackoff(float): the maximum delay between two attempts in seconds
+        budget(float | None): the total time a request may take including its retries, unlimited if None
+        rateLimiter(RateLimiter | None): the rate limiter shared by the handlers sending to the same hosts
+    """
+
+    def __init__(
+        self,
+        timeout: float = 10,
+        retry: int = 3,
+        headers: dict = {},
+        poolSize: int = 10,
+        keepAlive: bool = True,
+        backoff: float = 0.5,
+        maxBackoff: float = 8,
+        budget: float | None = None,
+        rateLimiter: RateLimiter | None = None,
+    ) -> None:
         self.timeout = timeout
         self.retry = retry
-        self.headers = headers
+        self.headers = headers | ({} if keepAlive else {"Connection": "close"})
+        self.backoff = backoff
+        self.maxBackoff = maxBackoff
+        self.budget = budget
+        self.rateLimiter = rateLimiter
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
 
-    def _handle_error(self, error) -> None:
-        if isinstance(error, requests.exceptions.HTTPError):
+    def _handle_error(self, error: Exception) -> None:
+        if isinstance(error, RequestError):
+            logger.critical(f"{type(error).__name__} - {error}")
+            raise error
+        elif isinstance(error, requests.exceptions.HTTPError):
             logger.critical(f"HTTP Error - {error}")
-        elif isinstance(error, requests.exceptions.ConnectionError):
-            logger.critical(f"Connection Error - {error}")
+            raise RequestHTTPError(str(error), error.response.status_code) from error
         elif isinstance(error, requests.exceptions.Timeout):
             logger.critical(f"Timeout Error - {error}")
-        elif isinstance(error, requests.exceptions.RequestException):
-            logger.critical(f"Request Exception - {error}")
+            raise RequestTimeoutError(str(error)) from error
+        elif isinstance(error, requests.exceptions.ConnectionError):
+            logger.critical(f"Connection Error - {error}")
+            raise RequestConnectionError(str(error)) from error
         elif isinstance(error, requests.exceptions.InvalidSchema):
             logger.critical(f"Invalid Schema Error - {error}")
+            raise RequestError(str(error)) from error
+        elif isinstance(error, requests.exceptions.RequestException):
+            logger.critical(f"Request Exception - {error}")
+            raise RequestError(str(error)) from error
         else:
             logger.critical(f"Unknown Error - {error}")
+            raise RequestError(str(error)) from error
 
-        exit(1)
+    @staticmethod
+    def _redact(kwargs: dict) -> dict:
+        # the body of a request may carry credentials (e.g. the login form), only its field names are logged
+        redacted: dict = {}
+        for key, value in kwargs.items():
+            if key in REDACTED_KWARGS and isinstance(value, dict):
+                redacted[key] = dict.fromkeys(value, "<redacted>")
+            elif key in REDACTED_KWARGS and value is not None:
+                redacted[key] = "<redacted>"
+            else:
+                redacted[key] = value
+        return redacted
 
-    def _sendRequest(self, method: str, url: str, **kwargs) -> requests.Response | None:
+    def _isRetryable(self, error: Exception) -> bool:
+        if isinstance(error, requests.exceptions.HTTPError):
+            return error.response is not None and error.response.status_code in RETRY_STATUS
+        return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+    def _getDelay(self, attempts: int, error: Exception) -> float:
+        response: requests.Response | None = getattr(error, "response", None)
+        retryAfter: str | None = response.headers.get("Retry-After") if response is not None else None
+        if retryAfter is not None and retryAfter.isdigit():
+            return min(float(retryAfter), self.maxBackoff)
+        return random.uniform(0, min(self.maxBackoff, self.backoff * 2**attempts))
+
+    def _sendRequest(self, method: str, url: str, **kwargs) -> requests.Response:
+        deadline: float | None = time.monotonic() + self.budget if self.budget is not None else None
         for attempts in range(self.retry):
             try:
-                logger.debug(f"{method} - {url} with **kwargs: {kwargs}")
+                if self.rateLimiter is not None:
+                    self.rateLimiter.acquire(url)
+                timeout: float = self.timeout
+                if deadline is not None:
+                    timeout = min(timeout, deadline - time.monotonic())
+                    if timeout <= 0:
+                        raise RequestTimeoutError(f"{method} {url} exceeded the time budget of {self.budget}s")
+                logger.debug(f"{method} - {url} with **kwargs: {self._redact(kwargs)}")
                 response = self.session.request(
                     method=method,
                     url=url,
-                    timeout=self.timeout,
+                    timeout=timeout,
                     headers=self.headers,
                     **kwargs,
                 )
-                # response = method(url, timeout=self.timeout, headers=self.headers, **kwargs)
                 response.raise_for_status()
                 logger.success(f"Successfully {method}: {url}")
                 return response
             except Exception as e:
-                logger.warning(
-                    f"{method} failed (Attempt:[{attempts+1}/{self.retry}]): {e}"
-                )
-                if attempts + 1 == self.retry:
+                logger.warning(f"{method} failed (Attempt:[{attempts+1}/{self.retry}]): {e}")
+                if attempts + 1 == self.retry or not self._isRetryable(e):
                     self._handle_error(e)
+                delay: float = self._getDelay(attempts, e)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    error = RequestTimeoutError(f"{method} {url} exceeded the time budget of {self.budget}s")
+                    self._handle_error(error)
+                logger.debug(f"Retrying {method} - {url} in {delay:.2f}s")
+                time.sleep(delay)
 
-        return None
+        raise RequestError(f"{method} {url} is not sent, retry should be positive")
 
     def get(self, url: str, **kwargs) -> requests.Response:
         return self._sendRequest("GET", url, **kwargs)
@@ -64,5 +177,26 @@ class RequestHandler:
         return self._sendRequest("DELETE", url, **kwargs)
 
 
+class RequestError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class RequestHTTPError(RequestError):
+    def __init__(self, message, status: int):
+        super().__init__(message)
+        self.status = status
+
+
+class RequestConnectionError(RequestError):
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class RequestTimeoutError(RequestError):
+    def __init__(self, message):
+        super().__init__(message)
+
+
 if __name__ == "__main__":
     logger.warning("This module cannot run independently")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# coding=utf-8
+import gzip
+import hashlib
+import os
+import time
+from pathlib import Path
+
+from loguru import logger
+
+CACHE_TTL = 6 * 60 * 60  # seconds, the schedule rarely changes within a day
+
+
+class ResponseCache:
+    """
+    On-disk cache of PowerSchool pages, keyed by account + URL and compressed with gzip
+
+    The account is hashed into the file name, no username is stored in plain text.
+    An entry expires TTL seconds after it is written.
+    The pages contain grades and attendance, so the directory and the files are only accessible by the current user.
+
+    Args:
+        directory(Path): the cache directory, created if it does not exist
+        ttl(float): the time to live of an entry in seconds
+    """
+
+    def __init__(self, directory: Path, ttl: float = CACHE_TTL) -> None:
+        self.directory = directory
+        self.ttl = ttl
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self.directory.chmod(0o700)  # also restrict a directory created by an older version
+
+    def getPath(self, account: str, url: str) -> Path:
+        key: str = hashlib.sha256(f"{account}\x00{url}".encode()).hexdigest()
+        return self.directory / f"{key}.gz"
+
+    def get(self, account: str, url: str) -> bytes | None:
+        """
+        Get a cached page
+
+        Args:
+            account(str): the key of the account, see PowerSchool.getAccountKey()
+            url(str): the URL of the page
+
+        Returns:
+            bytes | None: the content of the page, None if it is not cached or expired
+        """
+        path: Path = self.getPath(account, url)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl:
+                logger.debug(f"Cache of {url} is expired")
+                return None
+            return gzip.decompress(path.read_bytes())
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError) as e:
+            logger.warning(f"Cache of {url} is corrupted and ignored: {e}")
+            return None
+
+    def put(self, account: str, url: str, content: bytes) -> None:
+        """
+        Cache a page, the file is replaced atomically so that a concurrent reader never sees a partial entry
+
+        Args:
+            account(str): the key of the account, see PowerSchool.getAccountKey()
+            url(str): the URL of the page
+            content(bytes): the content of the page
+        """
+        path: Path = self.getPath(account, url)
+        temporaryPath: Path = path.with_suffix(f".{os.getpid()}.tmp")
+        fd: int = os.open(temporaryPath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(gzip.compress(content))
+        os.replace(temporaryPath, path)
+        logger.debug(f"{url} is cached to {path.name}")
+
+
+if __name__ == "__main__":
+    logger.warning("This module cannot run independently")
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# coding=utf-8
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import quote, unquote, urlsplit
+
+from loguru import logger
+
+from artifactCache import getSourceDigest
+from data import Term, generateICS, parseSchedule
+
+CACHE_SIZE = 256  # rendered calendars kept in memory
+
+
+class ICSCache:
+    """
+    Thread-safe LRU cache of rendered calendars, keyed by the content hash of schedule + config
+
+    Args:
+        maxsize(int): the maximum number of calendars in the cache
+    """
+
+    def __init__(self, maxsize: int = CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self.__items: OrderedDict[str, tuple[str, bytes]] = OrderedDict()
+        self.__lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, key: str) -> tuple[str, bytes] | None:
+        with self.__lock:
+            item: tuple[str, bytes] | None = self.__items.get(key)
+            if item is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.__items.move_to_end(key)
+            return item
+
+    def put(self, key: str, etag: str, body: bytes) -> None:
+        with self.__lock:
+            self.__items[key] = (etag, body)
+            self.__items.move_to_end(key)
+            while len(self.__items) > self.maxsize:
+                self.__items.popitem(last=False)
+
+
+class FeedNotFoundError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class FeedServer(ThreadingHTTPServer):
+    """
+    HTTP/webcal server of the ICS feeds, one feed per term
+
+    Feeds are served from a schedule file as "/<term>.ics",
+    or from a batch directory (see main.iterBatch) as "/<student>/<term>.ics".
+    The files are read on every request, so edits are picked up without restarting the server,
+    and a calendar is only rendered again when the content of its schedule or config changes.
+
+    Args:
+        address(tuple[str, int]): the host and port to listen on
+        config(dict): the global config, overridden by the config.json of each student in a batch
+        schedulePath(Path | None): the schedule file to serve
+        batchPath(Path | None): the batch directory to serve, used instead of schedulePath
+        cacheSize(int): the maximum number of rendered calendars kept in memory
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        config: dict,
+        schedulePath: Path | None = None,
+        batchPath: Path | None = None,
+        cacheSize: int = CACHE_SIZE,
+    ) -> None:
+        if batchPath is not None and not batchPath.is_dir():
+            raise ValueError(f"{batchPath} is not a directory, only batch directories can be served")
+        self.config = config
+        self.schedulePath = schedulePath
+        self.batchPath = batchPath
+        self.cache = ICSCache(cacheSize)
+        super().__init__(address, FeedRequestHandler)
+
+    def getSource(self, student: str | None) -> tuple[bytes, dict]:
+        """
+        Read the schedule file and the config of a feed
+
+        Args:
+            student(str | None): the student subdirectory of the batch, None if a single schedule is served
+
+        Returns:
+            tuple[bytes, dict]: the content of the schedule file and the merged config
+        """
+        if self.batchPath is None:
+            if student is not None:
+                raise FeedNotFoundError(f'Student "{student}" does not exist, no batch is served')
+            return self.schedulePath.read_bytes(), self.config | {"name": self.config.get("name") or "Schedule"}
+
+        studentPath: Path = (self.batchPath / student).resolve() if student else self.batchPath
+        if student is None or studentPath.parent != self.batchPath or not (studentPath / "schedule.json").is_file():
+            raise FeedNotFoundError(f'Student "{student}" does not exist')
+        configPath: Path = studentPath / "config.json"
+        ownConfig: dict = json.loads(configPath.read_bytes()) if configPath.exists() else {}
+        # the feeds of the students are told apart by their names, the global name is not used
+        studentConfig: dict = self.config | ownConfig | {"name": ownConfig.get("name") or student}
+        return (studentPath / "schedule.json").read_bytes(), studentConfig
+
+    def getFeeds(self) -> list[str]:
+        """
+        Returns:
+            list[str]: the paths of every feed that can be served
+        """
+        sources: list[tuple[str | None, Path]] = (
+            [(None, self.schedulePath)]
+            if self.batchPath is None
+            else [(item.name, item / "schedule.json") for item in sorted(self.batchPath.iterdir()) if item.is_dir()]
+        )
+        feeds: list[str] = []
+        for student, schedulePath in sources:
+            try:
+                termNames: list[str] = list(json.loads(schedulePath.read_bytes()))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Cannot list the feeds of {schedulePath}: {e}")
+                continue
+            prefix: str = f"/{quote(student)}" if student is not None else ""
+            feeds.extend(f"{prefix}/{quote(termName)}.ics" for termName in termNames)
+        return feeds
+
+    def render(self, student: str | None, termName: str) -> tuple[str, bytes]:
+        """
+        Render the calendar of a term, or get it from the cache if its schedule and config are unchanged
+
+        Args:
+            student(str | None): the student subdirectory of the batch, None if a single schedule is served
+            termName(str): the name of the term
+
+        Returns:
+            tuple[str, bytes]: the strong ETag and the content of the calendar
+        """
+        schedule, config = self.getSource(student)
+        key: str = hashlib.sha256(
+            b"\x00".join(
+                (
+                    getSourceDigest().encode(),
+                    schedule,
+                    json.dumps(config, sort_keys=True, default=str).encode(),
+                    termName.encode(),
+                )
+            )
+        ).hexdigest()
+        cached: tuple[str, bytes] | None = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        terms: list[Term] = [term for term in parseSchedule(json.loads(schedule)) if term.name == termName]
+        if not terms:
+            raise FeedNotFoundError(f'Term "{termName}" does not exist')
+        # the DTSTAMP is the time the inputs are first rendered, it is kept with the cached calendar,
+        # so a cached key always gives the same bytes and the ETag of the bytes is strong
+        body: bytes = generateICS(terms[0], config, dtstamp=datetime.now())
+        etag: str = f'"{hashlib.sha256(body).hexdigest()}"'
+        self.cache.put(key, etag, body)
+        logger.info(f"Rendered {config['name']} - {termName}, cache: {self.cache.hits} hits, {self.cache.misses} misses")
+        return etag, body
+
+
+class FeedRequestHandler(BaseHTTPRequestHandler):
+    server: FeedServer
+
+    def do_GET(self) -> None:
+        self.__respond(withBody=True)
+
+    def do_HEAD(self) -> None:
+        self.__respond(withBody=False)
+
+    def __respond(self, withBody: bool) -> None:
+        parts: list[str] = [unquote(part) for part in urlsplit(self.path).path.split("/") if part]
+        if not parts:  # index of the feeds
+            host: str = self.headers.get("Host", f"{self.server.server_address[0]}:{self.server.server_address[1]}")
+            body: bytes = "".join(f"webcal://{host}{feed}\n" for feed in self.server.getFeeds()).encode()
+            self.__send(HTTPStatus.OK, body if withBody else b"", {"Content-Type": "text/plain; charset=utf-8"})
+            return
+        if len(parts) > 2 or not parts[-1].endswith(".ics"):
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        try:
+            etag, body = self.server.render(parts[0] if len(parts) == 2 else None, parts[-1].removesuffix(".ics"))
+        except FeedNotFoundError as e:
+            self.send_error(HTTPStatus.NOT_FOUND, str(e))
+            return
+        except Exception as e:
+            logger.error(f"Failed to render {self.path}: {e}")
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR)
+            return
+
+        # weak comparison, as required for If-None-Match
+        ifNoneMatch: list[str] = [
+            tag.strip().removeprefix("W/") for tag in self.headers.get("If-None-Match", "").split(",")
+        ]
+        if etag in ifNoneMatch or "*" in ifNoneMatch:
+            self.__send(HTTPStatus.NOT_MODIFIED, b"", {"ETag": etag})
+            return
+        self.__send(
+            HTTPStatus.OK,
+            body if withBody else b"",
+            {"Content-Type": "text/calendar; charset=utf-8", "ETag": etag, "Cache-Control": "no-cache"},
+            contentLength=len(body),
+        )
+
+    def __send(self, status: HTTPStatus, body: bytes, headers: dict[str, str], contentLength: int | None = None) -> None:
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.send_header("Content-Length", str(contentLength if contentLength is not None else len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+
+def serve(
+    host: str,
+    port: int,
+    config: dict,
+    schedulePath: Path | None = None,
+    batchPath: Path | None = None,
+    cacheSize: int = CACHE_SIZE,
+) -> None:
+    """
+    Serve the ICS feeds until interrupted
+
+    Args:
+        host(str): the host to listen on
+        port(int): the port to listen on
+        config(dict): the global config
+        schedulePath(Path | None): the schedule file to serve
+        batchPath(Path | None): the batch directory to serve, used instead of schedulePath
+        cacheSize(int): the maximum number of rendered calendars kept in memory
+    """
+    with FeedServer((host, port), config, schedulePath, batchPath, cacheSize) as server:
+        logger.info(f"Serving ICS feeds on http://{host}:{server.server_address[1]}/, press Ctrl+C to stop")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info("Server stopped")
+
+
+if __name__ == "__main__":
+    logger.warning("This module cannot run independently")
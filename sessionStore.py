@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# coding=utf-8
+import hashlib
+import json
+import os
+import time
+from http.cookiejar import Cookie, CookieJar
+from pathlib import Path
+
+from loguru import logger
+
+SESSION_TTL = 30 * 60  # seconds, PowerSchool signs out an idle session after about half an hour
+
+
+class SessionStore:
+    """
+    On-disk store of PowerSchool session cookies, one file per account
+
+    A saved session is only a hint, it still has to be validated by the server before it is trusted.
+    It expires TTL seconds after it is saved, the cookies that expire earlier are dropped when it is loaded.
+    The account is hashed into the file name and the file is only readable by the current user.
+
+    Args:
+        directory(Path): the store directory, created if it does not exist
+        ttl(float): the time to live of a session in seconds
+    """
+
+    def __init__(self, directory: Path, ttl: float = SESSION_TTL) -> None:
+        self.directory = directory
+        self.ttl = ttl
+        self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        self.directory.chmod(0o700)  # also restrict a directory created by an older version
+
+    def getPath(self, account: str) -> Path:
+        key: str = hashlib.sha256(f"session\x00{account}".encode()).hexdigest()
+        return self.directory / f"{key}.json"
+
+    def load(self, account: str, cookieJar: CookieJar) -> bool:
+        """
+        Load the saved session of an account into a cookie jar
+
+        Args:
+            account(str): the key of the account, see PowerSchool.getAccountKey()
+            cookieJar(CookieJar): the cookie jar of the session, e.g. requests.Session.cookies
+
+        Returns:
+            bool: True if any unexpired cookie is loaded
+        """
+        path: Path = self.getPath(account)
+        try:
+            session: dict = json.loads(path.read_bytes())
+            if time.time() - session["savedAt"] > self.ttl:
+                logger.debug("Saved PowerSchool session is expired")
+                return False
+            cookies: list[Cookie] = [self.__toCookie(item) for item in session["cookies"]]
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Saved PowerSchool session is corrupted and ignored: {e}")
+            return False
+
+        now: int = int(time.time())
+        cookies = [cookie for cookie in cookies if not cookie.is_expired(now)]
+        for cookie in cookies:
+            cookieJar.set_cookie(cookie)
+        logger.debug(f"{len(cookies)} cookies of the saved PowerSchool session are loaded")
+        return bool(cookies)
+
+    def save(self, account: str, cookieJar: CookieJar) -> None:
+        """
+        Save the session of an account, the file is replaced atomically
+
+        Args:
+            account(str): the key of the account, see PowerSchool.getAccountKey()
+            cookieJar(CookieJar): the cookie jar of the logged in session
+        """
+        path: Path = self.getPath(account)
+        temporaryPath: Path = path.with_suffix(f".{os.getpid()}.tmp")
+        content: bytes = json.dumps(
+            {
+                "savedAt": time.time(),
+                "cookies": [
+                    {
+                        "name": cookie.name,
+                        "value": cookie.value,
+                        "domain": cookie.domain,
+                        "domainSpecified": cookie.domain_specified,
+                        "path": cookie.path,
+                        "secure": cookie.secure,
+                        "expires": cookie.expires,
+                    }
+                    for cookie in cookieJar
+                ],
+            }
+        ).encode()
+        # the cookies grant access to the account as well as the password does
+        fd: int = os.open(temporaryPath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(temporaryPath, path)
+        logger.debug(f"PowerSchool session is saved to {path.name}")
+
+    def invalidate(self, account: str) -> None:
+        self.getPath(account).unlink(missing_ok=True)
+
+    @staticmethod
+    def __toCookie(item: dict) -> Cookie:
+        return Cookie(
+            version=0,
+            name=item["name"],
+            value=item["value"],
+            port=None,
+            port_specified=False,
+            domain=item["domain"],
+            domain_specified=item["domainSpecified"],
+            domain_initial_dot=item["domain"].startswith("."),
+            path=item["path"],
+            path_specified=True,
+            secure=item["secure"],
+            expires=item["expires"],
+            discard=item["expires"] is None,
+            comment=None,
+            comment_url=None,
+            rest={},
+        )
+
+
+if __name__ == "__main__":
+    logger.warning("This module cannot run independently")
@@ -0,0 +1,28 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from benchmark import IMPORT_TIME_BUDGET, measureImportTime
+
+HEAVY_MODULES = ("bs4", "lxml", "requests", "icalendar")  # the scraping stack and the lazily imported serializer
+
+
+def testImportTimeBudget() -> None:
+    importTime: float = min(measureImportTime("data") for _ in range(3))  # the best of 3 runs, against a noisy machine
+    assert importTime <= IMPORT_TIME_BUDGET, f'"import data" took {importTime:.3f}s, budget {IMPORT_TIME_BUDGET}s'
+
+
+@pytest.mark.parametrize("module", ["data", "main"])
+def testHeavyModulesAreNotImported(module: str) -> None:
+    result = subprocess.run(
+        [sys.executable, "-c", f"import json, sys, {module}; print(json.dumps(sorted(sys.modules)))"],
+        cwd=Path(__file__).resolve().parent.parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules: set[str] = {name.split(".")[0] for name in json.loads(result.stdout.splitlines()[-1])}
+    assert not modules & set(HEAVY_MODULES)
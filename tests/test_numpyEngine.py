@@ -0,0 +1,28 @@
+import pytest
+
+from data import getStrategy, iterOccurrences, parseSchedule
+from test_serializer import getConfig, getSchedule
+
+pytest.importorskip("numpy")
+numpyEngine = pytest.importorskip("numpyEngine")
+
+
+@pytest.mark.parametrize("countDayInHoliday", [True, False])
+def testExpandOccurrencesMatchesDateRange(countDayInHoliday: bool) -> None:
+    config: dict = getConfig(False, False) | {"countDayInHoliday": countDayInHoliday}
+    loopTerm, numpyTerm = parseSchedule(getSchedule(True))[0], parseSchedule(getSchedule(True))[0]
+    assert getStrategy(loopTerm, config) == "dateRange"
+
+    compensations: set[int] = {date.toordinal() for date, _ in loopTerm.getCompensations()}
+    expected: dict[str, list[tuple[int, int]]] = {course.name: [] for course in loopTerm.courses}
+    for course, date, block, rrule, rdates in iterOccurrences(loopTerm, config):
+        assert rrule is None and not rdates
+        if date.toordinal() not in compensations:  # added to the table by data.expandNumpyOccurrences
+            expected[course.name].append((date.toordinal(), block))
+
+    expanded = numpyEngine.expandOccurrences(numpyTerm, countDayInHoliday)
+    actual: dict[str, list[tuple[int, int]]] = {
+        course.name: list(zip(days, blocks)) for course, days, blocks in expanded
+    }
+    assert sum(map(len, actual.values())) > 0
+    assert actual == expected
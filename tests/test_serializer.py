@@ -0,0 +1,121 @@
+from datetime import datetime
+
+import pytest
+
+from data import generateICS, getStrategy, parseSchedule
+
+DTSTAMP = datetime(2025, 1, 1, 12, 0, 0)
+LONG_NAME = "Advanced Placement Computer Science Principles and Applications 12 (Honours Section)"
+
+
+def getSchedule(holidays: bool) -> dict:
+    term: dict = {
+        "start": [2024, 9, 2],
+        "end": [2024, 12, 20],
+        "duration": 70,
+        "timetable": [[8, 0], [9, 15], [10, 30], [13, 0], [14, 15]],
+        "cycle": 2,
+        "courses": {
+            "Calculus 12": {"teacher": "Charles Zhang", "index": [["even", 1]], "location": "A205"},
+            "English Studies 12": {"teacher": "Lucy Liu", "index": [["everyday", 2]], "location": "A311"},
+            "Mandarin 12": {"teacher": "吴圣哲", "cycle": 1, "index": [[[2, 4], 3]], "location": "A312/A212"},
+            LONG_NAME: {"teacher": "Don Park-Fitzgerald", "index": ["P4(1-3)", "P5(2,7)"], "location": "Innovation Hub"},
+        },
+    }
+    if holidays:
+        term["holidays"] = {
+            "Mid-Autumn Festival": {"type": "fixed", "date": [[2024, 9, 16], [2024, 9, 17]]},
+            "National Day": {
+                "type": "fixed",
+                "date": [[2024, 10, 1], [2024, 10, 7]],
+                "compensation": [[[2024, 10, 12], 3]],
+            },
+        }
+    return {"Term 1": term}
+
+
+def getConfig(reduceFileSize: bool, alarm: bool) -> dict:
+    return {
+        "name": f"{LONG_NAME} Calendar",
+        "color": "#67e4fa",
+        "alarm": {"enabled": alarm, "before": [0, 7]},
+        "countDayInHoliday": False,
+        "reduceFileSize": reduceFileSize,
+    }
+
+
+@pytest.mark.parametrize("alarm", [True, False])
+@pytest.mark.parametrize(
+    "strategy, holidays, reduceFileSize",
+    [("dateRange", True, False), ("rrule", False, True), ("segmentedRRule", True, True)],
+)
+def testTemplateMatchesIcalendar(strategy: str, holidays: bool, reduceFileSize: bool, alarm: bool) -> None:
+    config: dict = getConfig(reduceFileSize, alarm)
+    fastTerm, slowTerm = parseSchedule(getSchedule(holidays))[0], parseSchedule(getSchedule(holidays))[0]
+    assert getStrategy(fastTerm, config) == strategy
+
+    fast: bytes = generateICS(fastTerm, config, fast=True, dtstamp=DTSTAMP)
+    slow: bytes = generateICS(slowTerm, config, fast=False, dtstamp=DTSTAMP)
+    assert fast.count(b"BEGIN:VEVENT") > 0
+    assert b"\r\n " in fast  # the long names are folded
+    assert fast == slow
+
+
+def getUIDs(ics: bytes) -> set[bytes]:
+    return {line for line in ics.split(b"\r\n") if line.startswith(b"UID:")}
+
+
+def testUIDsAreStableAndUniquePerCalendar() -> None:
+    config: dict = getConfig(False, True)
+    first: set[bytes] = getUIDs(generateICS(parseSchedule(getSchedule(True))[0], config, dtstamp=DTSTAMP))
+    again: set[bytes] = getUIDs(generateICS(parseSchedule(getSchedule(True))[0], config, dtstamp=datetime.now()))
+    other: set[bytes] = getUIDs(
+        generateICS(parseSchedule(getSchedule(True))[0], config | {"name": "Another Student"}, dtstamp=DTSTAMP)
+    )
+    assert first and first == again
+    assert not first & other  # the same term and course names in another calendar
+
+
+def expandOccurrences(ics: bytes) -> list[tuple[str, datetime]]:
+    from dateutil.rrule import rrulestr
+    from icalendar import Calendar
+
+    occurrences: list[tuple[str, datetime]] = []
+    for event in Calendar.from_ical(ics).walk("VEVENT"):
+        start: datetime = event["DTSTART"].dt
+        starts: set[datetime] = {start}
+        if "RRULE" in event:
+            starts.update(rrulestr(event["RRULE"].to_ical().decode(), dtstart=start))
+        rdates = event.get("RDATE", [])
+        for rdate in rdates if isinstance(rdates, list) else [rdates]:
+            starts.update(item.dt for item in rdate.dts)
+        occurrences.extend((str(event["SUMMARY"]), item) for item in starts)
+    return sorted(occurrences)
+
+
+def testSegmentedRRuleExpandsToTheSameOccurrences() -> None:
+    segmentedTerm, baselineTerm = parseSchedule(getSchedule(True))[0], parseSchedule(getSchedule(True))[0]
+    assert getStrategy(segmentedTerm, getConfig(True, False)) == "segmentedRRule"
+    assert getStrategy(baselineTerm, getConfig(False, False)) == "dateRange"
+
+    segmented: bytes = generateICS(segmentedTerm, getConfig(True, False), dtstamp=DTSTAMP)
+    baseline: bytes = generateICS(baselineTerm, getConfig(False, False), dtstamp=DTSTAMP)
+    assert b"RRULE:" in segmented and b"RDATE" in segmented  # the compensation day is added as RDATE
+    assert segmented.count(b"BEGIN:VEVENT") < baseline.count(b"BEGIN:VEVENT")
+    occurrences: list[tuple[str, datetime]] = expandOccurrences(segmented)
+    assert any(start.date() == datetime(2024, 10, 12).date() for _, start in occurrences)
+    assert not any(datetime(2024, 10, 1) <= start < datetime(2024, 10, 8) for _, start in occurrences)
+    assert occurrences == expandOccurrences(baseline)
+
+
+def testUIDsOfUnnamedCalendarAreStableAcrossRuns(monkeypatch: pytest.MonkeyPatch) -> None:
+    import main
+
+    uids: list[set[bytes]] = []
+    for now in (datetime(2025, 1, 1, 8, 0, 0), datetime(2025, 1, 2, 9, 30, 0)):  # two runs on different days
+        monkeypatch.setattr(main, "datetime", type("FrozenDatetime", (datetime,), {"now": staticmethod(lambda: now)}))
+        config: dict = getConfig(False, True) | {"name": "", "schedulePath": "/schedules/alice.json"}
+        main.setDefaultName(config)
+        uids.append(getUIDs(generateICS(parseSchedule(getSchedule(True))[0], config, dtstamp=DTSTAMP)))
+        assert config["name"].startswith("Schedule-")
+    assert uids[0] and uids[0] == uids[1]
@@ -24,6 +24,7 @@ __all__ = [
     "day2str",
     "setEnvVar",
     "requestValue",
+    "getChildPath",
 ]
 
 
@@ -202,6 +203,28 @@ def setEnvVar(key: str, value: str) -> None:
         raise e
 
 
+def getChildPath(root: Path, name: str) -> Path:
+    """
+    Resolve a name from the input (a student, an account, a calendar) into a file or directory directly in root
+
+    Args:
+        root(Path): the output directory
+        name(str): the name of the file or directory
+
+    Raises:
+        ValueError: the name is empty, absolute, contains a path separator or "..", or escapes root
+
+    Returns:
+        Path: the resolved path, its parent is root
+    """
+    if not name.strip() or any(part in name for part in ("/", "\\", "..", "\x00")) or Path(name).is_absolute():
+        raise ValueError(f'Invalid name "{name}", it cannot be absolute or contain "/", "\\" or ".."')
+    path: Path = (root / name).resolve()
+    if path.parent != root.resolve():
+        raise ValueError(f'Invalid name "{name}", it is outside of {root}')
+    return path
+
+
 def requestValue(prompt: str, type_: type, defaultValue: any = None, unit: str = "") -> any:
     if unit:
         unit = " " + unit